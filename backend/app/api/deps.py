@@ -1,5 +1,4 @@
 from app.database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 __all__ = ["get_db"]
-
@@ -1,38 +1,133 @@
 """
 API endpoints for hotel recommendations
 """
+import asyncio
+import hashlib
 import logging
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from cachetools import TTLCache
 from fastapi import APIRouter, HTTPException, Depends
+from pydantic import ValidationError
+from app.config import settings
 from app.schemas.recommendation import (
+    BatchExtractionRequest,
+    ChatGPTParameterExtractionResponse,
+    HotelInfo,
     RecommendationRequest,
     RecommendationResponse,
     SearchParameters
 )
-from app.services.chatgpt_service import ChatGPTService
+from app.services.chatgpt_service import ChatGPTService, demand_fingerprint
 from app.services.booking_service import BookingService
-from app.database import get_db
+from app.services.semantic_cache import SemanticCache
+from app.database import AsyncSessionLocal
 from app.crud import hotel as hotel_crud
-from sqlalchemy.orm import Session
+from app.utils.cache import SingleFlight
+from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Recent responses and in-flight pipelines, keyed by normalized user demand
+_recent_recommendations = TTLCache(maxsize=256, ttl=settings.recommendation_cache_ttl)
+_inflight_recommendations = SingleFlight()
 
-def get_chatgpt_service() -> ChatGPTService:
-    """Dependency to get ChatGPT service instance"""
+# Extracted parameters, reused for near-identical phrasings of a demand with the same
+# numbers, dates and location (scoped by demand_fingerprint)
+_extraction_cache = SemanticCache()
+# Matched hotel IDs for near-identical demands (same literals and ranking criteria)
+# over the same set of hotels
+_filter_cache = SemanticCache()
+
+
+@lru_cache(maxsize=1)
+def _chatgpt_service() -> ChatGPTService:
     return ChatGPTService()
 
 
-def get_booking_service() -> BookingService:
-    """Dependency to get Booking.com service instance"""
+@lru_cache(maxsize=1)
+def _booking_service() -> BookingService:
     return BookingService()
 
 
+async def get_chatgpt_service() -> ChatGPTService:
+    """Dependency to get the shared ChatGPT service instance"""
+    return _chatgpt_service()
+
+
+async def get_booking_service() -> BookingService:
+    """Dependency to get the shared Booking.com service instance"""
+    return _booking_service()
+
+
+async def _save_hotels(db: AsyncSession, hotels: List[Dict[str, Any]]) -> None:
+    """Save hotels to database (store full booking.com API response), never failing the request"""
+    try:
+        saved_count = await hotel_crud.bulk_create_or_update_hotels(db, hotels)
+        logger.info("Saved %d hotels to database", saved_count)
+    except Exception as e:
+        logger.warning("Failed to save hotels to database: %s. Continuing with in-memory data.", e)
+
+
+def _to_search_parameters(extracted_params: ChatGPTParameterExtractionResponse) -> SearchParameters:
+    """Convert ChatGPT extraction output to SearchParameters, applying defaults"""
+    return SearchParameters(
+        location=extracted_params.location,
+        check_in=extracted_params.check_in,
+        check_out=extracted_params.check_out,
+        budget_min=extracted_params.budget_min,
+        budget_max=extracted_params.budget_max,
+        adults=extracted_params.adults or 1,
+        children=extracted_params.children or 0,
+        rooms=extracted_params.rooms or 1,
+        preferences=extracted_params.preferences or []
+    )
+
+
+async def _extract_parameters(
+    chatgpt_service: ChatGPTService,
+    user_demand: str,
+    on_partial: Optional[Callable[[Dict[str, Any]], None]]
+) -> ChatGPTParameterExtractionResponse:
+    """Extract search parameters: exact-match cache first, then the semantic cache, then ChatGPT"""
+    # The exact-match lookup is local (or one Redis GET); the semantic cache costs an embedding call
+    cached = await chatgpt_service.acached_search_parameters(user_demand)
+    if cached is not None:
+        return cached
+    return await _extraction_cache.get_or_compute(
+        user_demand,
+        loader=partial(chatgpt_service.aextract_search_parameters_cacheable, on_partial=on_partial, check_cache=False),
+        scope=demand_fingerprint(user_demand)
+    )
+
+
+async def _search_hotels(
+    booking_service: BookingService,
+    search_params: SearchParameters,
+    speculative_searches: List[Tuple[SearchParameters, asyncio.Task]]
+) -> List[Dict[str, Any]]:
+    """Search hotels, reusing a speculative search if it ran with the same API parameters"""
+    for speculative_params, task in speculative_searches:
+        if all(
+            getattr(speculative_params, field) == getattr(search_params, field)
+            for field in BookingService.API_SEARCH_FIELDS
+        ):
+            return await task
+        logger.info("Extracted parameters changed after streaming, discarding speculative search")
+        task.cancel()
+    return await booking_service.search_hotels(search_params)
+
+
+def _demand_key(user_demand: str) -> str:
+    """Cache key for a user demand, ignoring case and surrounding whitespace"""
+    return hashlib.sha1(user_demand.strip().lower().encode()).hexdigest()
+
+
 @router.post("/recommend", response_model=RecommendationResponse)
 async def recommend_hotels(
     request: RecommendationRequest,
-    db: Session = Depends(get_db),
     chatgpt_service: ChatGPTService = Depends(get_chatgpt_service),
     booking_service: BookingService = Depends(get_booking_service)
 ):
@@ -44,132 +139,215 @@ async def recommend_hotels(
     2. Send to ChatGPT to extract search parameters (location, dates, budget, etc.)
     3. Call Booking.com API with extracted parameters
     4. Send Booking.com results to ChatGPT to filter/match hotels with user demand
+       (concurrently with saving them to the database)
     5. Return filtered and ranked hotel recommendations
+    
+    Identical demands share one pipeline run while it is in flight, and the
+    result is reused for `recommendation_cache_ttl` seconds afterwards.
     """
+    key = _demand_key(request.user_demand)
     try:
-        # Step 1: Extract search parameters using ChatGPT
-        logger.info(f"=== NEW REQUEST === Extracting parameters from user demand: {request.user_demand}")
-        extracted_params = chatgpt_service.extract_search_parameters(request.user_demand)
-        
-        # Convert to SearchParameters schema
-        search_params = SearchParameters(
-            location=extracted_params.location,
-            check_in=extracted_params.check_in,
-            check_out=extracted_params.check_out,
-            budget_min=extracted_params.budget_min,
-            budget_max=extracted_params.budget_max,
-            adults=extracted_params.adults or 1,
-            children=extracted_params.children or 0,
-            rooms=extracted_params.rooms or 1,
-            preferences=extracted_params.preferences or []
-        )
-        
-        logger.info(f"Extracted parameters: {search_params.model_dump()}")
-        
-        # Step 2: Search hotels using Booking.com API
-        logger.info("Searching hotels via Booking.com API...")
-        hotels = booking_service.search_hotels(search_params)
-        
-        if not hotels:
-            return RecommendationResponse(
-                user_demand=request.user_demand,
-                extracted_parameters=search_params,
-                matched_hotels=[],
-                total_results=0,
-                message="No hotels found matching your criteria."
+        response = _recent_recommendations.get(key)
+        if response is None:
+            response = await _inflight_recommendations.do(
+                key,
+                lambda: _recommend(request, chatgpt_service, booking_service)
             )
-        
-        logger.info(f"Found {len(hotels)} hotels from Booking.com API")
-        
-        # Step 2.5: Save hotels to database (store full booking.com API response)
-        logger.info("Saving hotels to database...")
-        try:
-            hotel_crud.bulk_create_or_update_hotels(db, hotels)
-            logger.info(f"Saved {len(hotels)} hotels to database")
-        except Exception as e:
-            logger.warning(f"Failed to save hotels to database: {e}. Continuing with in-memory data.")
-        
-        # Step 3: Filter hotels using ChatGPT based on user demand (returns only IDs)
-        logger.info("Filtering hotels using ChatGPT...")
-        matched_hotel_ids = chatgpt_service.filter_hotels_by_demand(
-            user_demand=request.user_demand,
-            hotels=hotels
-        )
-        
-        logger.info(f"ChatGPT matched {len(matched_hotel_ids)} hotel IDs: {matched_hotel_ids}")
-        
-        # Step 4: Map hotel IDs back to full hotel data
-        # Prioritize fresh API data over database (to avoid stale cached data)
-        matched_hotels = []
-        from app.schemas.recommendation import HotelInfo
-        
-        # Create lookup from in-memory data (fresh from API - this is the source of truth)
-        hotels_by_id = {str(h.get("hotel_id", "")): h for h in hotels if h.get("hotel_id")}
-        
-        for hotel_id in matched_hotel_ids:
-            hotel_data = None
-            
-            # Use fresh API data first (most up-to-date)
-            if hotel_id in hotels_by_id:
-                hotel_data = hotels_by_id[hotel_id]
-                logger.debug(f"Using fresh API data for hotel {hotel_id}")
-            else:
-                # Fallback to database only if not in fresh API results
-                try:
-                    db_hotel = hotel_crud.get_hotel(db, hotel_id)
-                    if db_hotel and db_hotel.booking_data:
-                        hotel_data = db_hotel.booking_data
-                        logger.debug(f"Loaded hotel {hotel_id} from database (not in fresh results)")
-                except Exception as e:
-                    logger.debug(f"Could not load hotel {hotel_id} from database: {e}")
-            
-            if hotel_data:
-                # Create HotelInfo with full raw_data containing complete booking.com response
-                hotel_info = HotelInfo(
-                    hotel_id=str(hotel_data.get("hotel_id", "")),
-                    name=hotel_data.get("name"),
-                    address=hotel_data.get("address"),
-                    city=hotel_data.get("city"),
-                    country=hotel_data.get("country"),
-                    latitude=hotel_data.get("latitude"),
-                    longitude=hotel_data.get("longitude"),
-                    price=hotel_data.get("price"),
-                    currency=hotel_data.get("currency", "EUR"),
-                    rating=hotel_data.get("rating"),
-                    review_score=hotel_data.get("review_score"),
-                    review_count=hotel_data.get("review_count"),
-                    amenities=hotel_data.get("amenities", []),
-                    description=hotel_data.get("description"),
-                    images=hotel_data.get("images", []),
-                    url=hotel_data.get("url"),
-                    raw_data=hotel_data  # Full booking.com API response as JSON
-                )
-                matched_hotels.append(hotel_info)
-        
-        logger.info(f"Filtered to {len(matched_hotels)} matching hotels")
-        
-        return RecommendationResponse(
-            user_demand=request.user_demand,
-            extracted_parameters=search_params,
-            matched_hotels=matched_hotels,
-            total_results=len(matched_hotels),
-            message=f"Found {len(matched_hotels)} hotels matching your preferences."
-        )
+            _recent_recommendations[key] = response
+        # Coalesced demands may differ in case/whitespace - echo this request's wording
+        return response.model_copy(update={"user_demand": request.user_demand})
         
     except ValueError as e:
-        logger.error(f"Configuration error: {e}")
+        logger.error("Configuration error: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Service configuration error: {str(e)}"
         )
     except Exception as e:
-        logger.error(f"Error processing recommendation request: {e}", exc_info=True)
+        logger.error("Error processing recommendation request: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing recommendation: {str(e)}"
         )
 
 
+async def _recommend(
+    request: RecommendationRequest,
+    chatgpt_service: ChatGPTService,
+    booking_service: BookingService
+) -> RecommendationResponse:
+    """
+    Run the full recommendation pipeline for a single user demand in its own database session.
+    Coalesced requests share this run, and it outlives a cancelled first caller, so it can't
+    borrow any one request's session
+    """
+    async with AsyncSessionLocal() as db:
+        return await _run_pipeline(request, db, chatgpt_service, booking_service)
+
+
+async def _run_pipeline(
+    request: RecommendationRequest,
+    db: AsyncSession,
+    chatgpt_service: ChatGPTService,
+    booking_service: BookingService
+) -> RecommendationResponse:
+    """Run the full recommendation pipeline for a single user demand"""
+    # Step 1: Extract search parameters using ChatGPT. With a real Booking.com API the
+    # completion is streamed, so the search can start before the trailing preferences arrive
+    logger.info("=== NEW REQUEST === Extracting parameters from user demand: %s", request.user_demand)
+    speculative_searches: List[Tuple[SearchParameters, asyncio.Task]] = []
+    
+    def start_speculative_search(fields: Dict[str, Any]) -> None:
+        if speculative_searches or not all(f in fields for f in BookingService.API_SEARCH_FIELDS):
+            return
+        try:
+            params = _to_search_parameters(ChatGPTParameterExtractionResponse(**fields))
+        except ValidationError:
+            return
+        logger.info("Search fields extracted, starting Booking.com search while streaming")
+        speculative_searches.append((params, asyncio.create_task(booking_service.search_hotels(params))))
+    
+    # Short demands the rules fully understand skip the embedding and both completions
+    extracted_params = (
+        chatgpt_service.rule_confident_parameters(request.user_demand) if settings.chatgpt_rule_first else None
+    )
+    if extracted_params is not None:
+        logger.info("Rule-based extraction is confident, skipping ChatGPT extraction")
+        ranking_criteria: List[str] = []
+    else:
+        # Ranking criteria only depend on the demand, so they are extracted concurrently
+        extracted_params, ranking_criteria = await asyncio.gather(
+            _extract_parameters(
+                chatgpt_service,
+                request.user_demand,
+                on_partial=start_speculative_search if booking_service.api_key else None
+            ),
+            chatgpt_service.aextract_ranking_criteria(request.user_demand)
+        )
+    search_params = _to_search_parameters(extracted_params)
+    
+    if logger.isEnabledFor(logging.INFO):
+        # model_dump walks the whole model, so only pay for it when the line is emitted
+        logger.info("Extracted parameters: %s", search_params.model_dump())
+    
+    # Step 2: Search hotels using Booking.com API
+    logger.info("Searching hotels via Booking.com API...")
+    hotels = await _search_hotels(booking_service, search_params, speculative_searches)
+    
+    if not hotels:
+        return RecommendationResponse.model_construct(
+            user_demand=request.user_demand,
+            extracted_parameters=search_params,
+            matched_hotels=[],
+            total_results=0,
+            message="No hotels found matching your criteria."
+        )
+    
+    logger.info("Found %d hotels from Booking.com API", len(hotels))
+    
+    # Step 2.5 + 3: Save hotels to database and filter them with ChatGPT concurrently.
+    # Both only depend on the Booking.com results, so there is no need to serialize them.
+    logger.info("Saving hotels to database and filtering hotels using ChatGPT...")
+    _, matched_hotel_ids = await asyncio.gather(
+        _save_hotels(db, hotels),
+        _filter_cache.get_or_compute(
+            request.user_demand,
+            loader=partial(
+                chatgpt_service.afilter_hotels_by_demand_cacheable, hotels=hotels, ranking_criteria=ranking_criteria
+            ),
+            # Same parts as the exact-match filter cache key, plus the demand's literal facts
+            scope="\n".join((
+                ",".join(sorted(str(h.get("hotel_id", "")) for h in hotels)),
+                "|".join(ranking_criteria),
+                demand_fingerprint(request.user_demand)
+            ))
+        )
+    )
+    
+    logger.info("ChatGPT matched %d hotel IDs: %s", len(matched_hotel_ids), matched_hotel_ids)
+    
+    # Step 4: Map hotel IDs back to full hotel data
+    # Prioritize fresh API data over database (to avoid stale cached data)
+    matched_hotels = []
+    
+    # Create lookup from in-memory data (fresh from API - this is the source of truth)
+    hotels_by_id: Dict[str, Dict[str, Any]] = {
+        str(hotel_id): h for h in hotels if (hotel_id := h.get("hotel_id"))
+    }
+    
+    # Fallback to database only for IDs not in fresh API results, in a single IN query
+    missing_ids = [hotel_id for hotel_id in matched_hotel_ids if hotel_id not in hotels_by_id]
+    db_hotels_by_id = {}
+    if missing_ids:
+        try:
+            db_hotels_by_id = {
+                h.hotel_id: h.booking_data
+                for h in await hotel_crud.get_hotels_by_ids(db, missing_ids)
+                if h.booking_data
+            }
+            logger.debug("Loaded %d hotels from database (not in fresh results)", len(db_hotels_by_id))
+        except Exception as e:
+            logger.debug("Could not load hotels %s from database: %s", missing_ids, e)
+    
+    for hotel_id in matched_hotel_ids:
+        # Use fresh API data first (most up-to-date)
+        hotel_data = hotels_by_id.get(hotel_id) or db_hotels_by_id.get(hotel_id)
+        
+        if hotel_data:
+            # Create HotelInfo with full raw_data containing complete booking.com response.
+            # Skip validation: the data comes straight from the Booking.com response we just parsed
+            hotel_info = HotelInfo.model_construct(
+                hotel_id=str(hotel_data.get("hotel_id", "")),
+                name=hotel_data.get("name"),
+                address=hotel_data.get("address"),
+                city=hotel_data.get("city"),
+                country=hotel_data.get("country"),
+                latitude=hotel_data.get("latitude"),
+                longitude=hotel_data.get("longitude"),
+                price=hotel_data.get("price"),
+                currency=hotel_data.get("currency", "EUR"),
+                rating=hotel_data.get("rating"),
+                review_score=hotel_data.get("review_score"),
+                review_count=hotel_data.get("review_count"),
+                amenities=hotel_data.get("amenities", []),
+                description=hotel_data.get("description"),
+                images=hotel_data.get("images", []),
+                url=hotel_data.get("url"),
+                raw_data=hotel_data  # Full booking.com API response as JSON
+            )
+            matched_hotels.append(hotel_info)
+    
+    logger.info("Filtered to %d matching hotels", len(matched_hotels))
+    
+    return RecommendationResponse.model_construct(
+        user_demand=request.user_demand,
+        extracted_parameters=search_params,
+        matched_hotels=matched_hotels,
+        total_results=len(matched_hotels),
+        message=f"Found {len(matched_hotels)} hotels matching your preferences."
+    )
+
+
+@router.post("/extract", response_model=List[SearchParameters])
+async def extract_parameters_batch(
+    request: BatchExtractionRequest,
+    chatgpt_service: ChatGPTService = Depends(get_chatgpt_service)
+):
+    """
+    Extract search parameters for several demands (e.g. the legs of a multi-stop trip),
+    packing them into as few ChatGPT calls as settings.chatgpt_extraction_batch_size allows
+    """
+    try:
+        extracted = await chatgpt_service.aextract_search_parameters_batch(request.user_demands)
+    except Exception as e:
+        logger.error("Error extracting batch parameters: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error extracting parameters: {str(e)}"
+        )
+    return [_to_search_parameters(params) for params in extracted]
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint for recommendations service"""
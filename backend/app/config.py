@@ -1,5 +1,5 @@
+from functools import cached_property
 from pydantic_settings import BaseSettings
-from pydantic import model_validator
 from typing import List
 
 
@@ -10,7 +10,11 @@ class Settings(BaseSettings):
     debug: bool = False
     
     # Database settings
-    database_url: str = "sqlite:///./data/hotel_recommendation.db"
+    database_url: str = "sqlite+aiosqlite:///./data/hotel_recommendation.db"
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 10  # Seconds to wait for a free connection
+    db_pool_recycle: int = 1800  # Seconds before a connection is replaced
     
     # CORS settings - read as string from env, convert to list
     cors_origins: str = "http://localhost:3000,http://localhost:3001"
@@ -21,33 +25,31 @@ class Settings(BaseSettings):
     # OpenAI settings
     openai_api_key: str = ""
     openai_model: str = "gpt-4o-mini"  # Can use gpt-4o-mini, gpt-4, or gpt-3.5-turbo
+    openai_max_concurrency: int = 8  # In-flight OpenAI calls per worker
+    chatgpt_extraction_batch_size: int = 8  # Demands per batched extraction call (quality drops past ~16)
+    chatgpt_filter_shard_size: int = 20  # Hotels per concurrent ChatGPT filtering call
+    chatgpt_cache_ttl: int = 86400  # Seconds to reuse a completion for an identical (normalized) request
+    chatgpt_rule_first: bool = False  # Skip ChatGPT for short demands the rule-based extractor fully understands
     
     # Booking.com API settings
     booking_api_key: str = ""
     booking_api_url: str = "https://distribution-xml.booking.com/json"
+    booking_search_pages: int = 3  # Result pages fetched concurrently per Booking.com search
+    booking_cache_ttl: int = 600  # Seconds to reuse a Booking.com response for identical search params
+    hotel_search_cache_ttl: int = 300  # Seconds each worker memoizes search results (mock or API)
     
-    @model_validator(mode='after')
-    def parse_cors_origins(self) -> 'Settings':
-        """Convert comma-separated string to list after validation"""
-        if isinstance(self.cors_origins, str):
-            # Split comma-separated string and strip whitespace
-            self._cors_origins_list = [
-                origin.strip() 
-                for origin in self.cors_origins.split(',') 
-                if origin.strip()
-            ]
-        elif isinstance(self.cors_origins, list):
-            self._cors_origins_list = self.cors_origins
-        else:
-            self._cors_origins_list = ["http://localhost:3000", "http://localhost:3001"]
-        return self
-    
-    @property
+    # Redis settings (empty disables the shared Booking.com response cache)
+    redis_url: str = ""
+    
+    # Recommendation settings
+    recommendation_cache_ttl: int = 60  # Seconds to reuse a response for an identical demand
+    semantic_cache_enabled: bool = False  # Reuse results for near-identical demands (costs an embedding call per miss)
+    semantic_cache_threshold: float = 0.92  # Cosine similarity to reuse extracted parameters (>1 disables)
+    semantic_cache_ttl: int = 3600  # Seconds to keep extracted parameters in the semantic cache
+    
+    @cached_property
     def cors_origins_list(self) -> List[str]:
-        """Get CORS origins as a list"""
-        if hasattr(self, '_cors_origins_list'):
-            return self._cors_origins_list
-        # Fallback if validator hasn't run
+        """Get CORS origins as a list (parsed once from the comma-separated string)"""
         return [
             origin.strip() 
             for origin in self.cors_origins.split(',') 
@@ -1,42 +1,44 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, func, select
 from typing import Optional, List
+from app.database import get_dialect_insert
 from app.models.blog import BlogPost
 from app.schemas.blog import BlogPostCreate, BlogPostUpdate
 import uuid
 
 
-def get_blog_post(db: Session, post_id: str) -> Optional[BlogPost]:
+async def get_blog_post(db: AsyncSession, post_id: str) -> Optional[BlogPost]:
     """Get a single blog post by ID"""
-    return db.query(BlogPost).filter(BlogPost.id == post_id).first()
+    return await db.scalar(select(BlogPost).where(BlogPost.id == post_id))
 
 
-def get_blog_posts(
-    db: Session,
+async def get_blog_posts(
+    db: AsyncSession,
     skip: int = 0,
     limit: int = 100,
     category: Optional[str] = None
 ) -> List[BlogPost]:
     """Get multiple blog posts with optional filtering"""
-    query = db.query(BlogPost)
+    query = select(BlogPost)
     
     if category:
-        query = query.filter(BlogPost.category == category)
+        query = query.where(BlogPost.category == category)
     
-    return query.order_by(desc(BlogPost.date)).offset(skip).limit(limit).all()
+    result = await db.scalars(query.order_by(desc(BlogPost.date)).offset(skip).limit(limit))
+    return list(result.all())
 
 
-def count_blog_posts(db: Session, category: Optional[str] = None) -> int:
+async def count_blog_posts(db: AsyncSession, category: Optional[str] = None) -> int:
     """Count total blog posts"""
-    query = db.query(BlogPost)
+    query = select(func.count()).select_from(BlogPost)
     
     if category:
-        query = query.filter(BlogPost.category == category)
+        query = query.where(BlogPost.category == category)
     
-    return query.count()
+    return await db.scalar(query)
 
 
-def create_blog_post(db: Session, post: BlogPostCreate) -> BlogPost:
+async def create_blog_post(db: AsyncSession, post: BlogPostCreate) -> BlogPost:
     """Create a new blog post"""
     db_post = BlogPost(
         id=str(uuid.uuid4()),
@@ -49,18 +51,35 @@ def create_blog_post(db: Session, post: BlogPostCreate) -> BlogPost:
         image_url=post.image_url,
     )
     db.add(db_post)
-    db.commit()
-    db.refresh(db_post)
+    await db.commit()
+    await db.refresh(db_post)
     return db_post
 
 
-def update_blog_post(
-    db: Session,
+async def seed_blog_posts(db: AsyncSession, posts: List[BlogPostCreate]) -> int:
+    """
+    Insert blog posts in a single statement, skipping any that already exist.
+    IDs are derived from titles so concurrent seeding (e.g. several workers) is idempotent.
+    """
+    rows = [
+        {"id": str(uuid.uuid5(uuid.NAMESPACE_URL, post.title)), **post.model_dump()}
+        for post in posts
+    ]
+    insert = get_dialect_insert(db)
+    result = await db.execute(
+        insert(BlogPost).values(rows).on_conflict_do_nothing(index_elements=[BlogPost.id])
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def update_blog_post(
+    db: AsyncSession,
     post_id: str,
     post_update: BlogPostUpdate
 ) -> Optional[BlogPost]:
     """Update an existing blog post"""
-    db_post = get_blog_post(db, post_id)
+    db_post = await get_blog_post(db, post_id)
     if not db_post:
         return None
     
@@ -68,18 +87,17 @@ def update_blog_post(
     for field, value in update_data.items():
         setattr(db_post, field, value)
     
-    db.commit()
-    db.refresh(db_post)
+    await db.commit()
+    await db.refresh(db_post)
     return db_post
 
 
-def delete_blog_post(db: Session, post_id: str) -> bool:
+async def delete_blog_post(db: AsyncSession, post_id: str) -> bool:
     """Delete a blog post"""
-    db_post = get_blog_post(db, post_id)
+    db_post = await get_blog_post(db, post_id)
     if not db_post:
         return False
     
-    db.delete(db_post)
-    db.commit()
+    await db.delete(db_post)
+    await db.commit()
     return True
-
@@ -1,20 +1,23 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from typing import Optional, List, Dict, Any
+from app.database import get_dialect_insert
 from app.models.hotel import Hotel
 
 
-def get_hotel(db: Session, hotel_id: str) -> Optional[Hotel]:
+async def get_hotel(db: AsyncSession, hotel_id: str) -> Optional[Hotel]:
     """Get a single hotel by hotel_id"""
-    return db.query(Hotel).filter(Hotel.hotel_id == hotel_id).first()
+    return await db.scalar(select(Hotel).where(Hotel.hotel_id == hotel_id))
 
 
-def get_hotels_by_ids(db: Session, hotel_ids: List[str]) -> List[Hotel]:
+async def get_hotels_by_ids(db: AsyncSession, hotel_ids: List[str]) -> List[Hotel]:
     """Get multiple hotels by their IDs"""
-    return db.query(Hotel).filter(Hotel.hotel_id.in_(hotel_ids)).all()
+    result = await db.scalars(select(Hotel).where(Hotel.hotel_id.in_(hotel_ids)))
+    return list(result.all())
 
 
-def create_or_update_hotel(
-    db: Session,
+async def create_or_update_hotel(
+    db: AsyncSession,
     hotel_id: str,
     booking_data: Dict[str, Any]
 ) -> Hotel:
@@ -22,7 +25,7 @@ def create_or_update_hotel(
     Create or update a hotel with booking.com API response data.
     Uses upsert pattern - updates if exists, creates if not.
     """
-    db_hotel = get_hotel(db, hotel_id)
+    db_hotel = await get_hotel(db, hotel_id)
     
     if db_hotel:
         # Update existing hotel
@@ -35,28 +38,39 @@ def create_or_update_hotel(
         )
         db.add(db_hotel)
     
-    db.commit()
-    db.refresh(db_hotel)
+    await db.commit()
+    await db.refresh(db_hotel)
     return db_hotel
 
 
-def bulk_create_or_update_hotels(
-    db: Session,
+async def bulk_create_or_update_hotels(
+    db: AsyncSession,
     hotels_data: List[Dict[str, Any]]
-) -> List[Hotel]:
+) -> int:
     """
     Bulk create or update hotels from booking.com API response.
     Each hotel dict should have 'hotel_id' key.
+    Runs a single INSERT ... ON CONFLICT DO UPDATE in one transaction
+    and returns the number of hotels saved.
     """
-    saved_hotels = []
-    
+    # Key by ID so a hotel repeated in one response is only upserted once
+    rows = {}
     for hotel_data in hotels_data:
         hotel_id = str(hotel_data.get("hotel_id", ""))
         if not hotel_id:
             continue  # Skip hotels without ID
-        
-        saved_hotel = create_or_update_hotel(db, hotel_id, hotel_data)
-        saved_hotels.append(saved_hotel)
+        rows[hotel_id] = {"hotel_id": hotel_id, "booking_data": hotel_data}
     
-    return saved_hotels
-
+    if not rows:
+        return 0
+    
+    insert = get_dialect_insert(db)
+    stmt = insert(Hotel).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Hotel.hotel_id],
+        # onupdate defaults don't fire for ON CONFLICT, so set updated_at explicitly
+        set_={"booking_data": stmt.excluded.booking_data, "updated_at": func.now()}
+    )
+    await db.execute(stmt)
+    await db.commit()
+    return len(rows)
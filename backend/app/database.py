@@ -1,23 +1,103 @@
-from sqlalchemy import create_engine
+import asyncio
+import orjson
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
+
+def get_async_database_url(database_url: str) -> str:
+    """Map sync driver URLs (e.g. from an existing .env) to their async drivers"""
+    if database_url.startswith("sqlite:///"):
+        return database_url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    if database_url.startswith("postgresql://"):
+        return database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return database_url
+
+
+# Explicit queue pool: aiosqlite would otherwise default to NullPool (a new connection per session)
+engine = create_async_engine(
+    get_async_database_url(settings.database_url),
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=True,
+    # orjson for JSON columns (e.g. the full booking.com payload in hotels.booking_data)
+    json_serializer=lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode(),
+    json_deserializer=orjson.loads,
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
 
 Base = declarative_base()
 
+# Dialect-specific INSERT constructs supporting ON CONFLICT clauses
+_DIALECT_INSERTS = {
+    "sqlite": sqlite_insert,
+    "postgresql": postgresql_insert,
+}
+
+
+def get_dialect_insert(db: AsyncSession):
+    """Get the INSERT construct (with on_conflict_* support) for the session's database"""
+    return _DIALECT_INSERTS[db.bind.dialect.name]
 
-def get_db():
+
+async def get_db():
     """Dependency for getting database session"""
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
+
+async def create_tables():
+    """Create missing tables, and add indexes that older databases lack"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_indexes)
+        await conn.run_sync(_drop_obsolete_indexes)
+
+
+def _add_missing_indexes(conn) -> None:
+    """create_all only creates indexes with their table, so add indexes introduced since then"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+# Indexes older databases may still carry, and that no query uses any more
+_OBSOLETE_INDEXES = (
+    "ix_hotels_hotel_id",  # Duplicated the primary key index on hotels.hotel_id
+    "ix_hotels_booking_data",  # GIN index on the JSONB payload; nothing queries inside it
+)
+
+
+def _drop_obsolete_indexes(conn) -> None:
+    """Drop indexes removed from the models, which only slow down writes"""
+    for name in _OBSOLETE_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+async def warm_up_pool():
+    """Open pool_size connections in parallel so the first burst skips connection setup"""
+    connections = await asyncio.gather(*[engine.connect() for _ in range(settings.db_pool_size)])
+    await asyncio.gather(*[conn.close() for conn in connections])
+
+
+async def check_db_connection() -> bool:
+    """Run SELECT 1 through the pool"""
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
@@ -1,39 +1,53 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from app.config import settings
-from app.database import engine, Base, SessionLocal
+from app.database import engine, AsyncSessionLocal, check_db_connection, create_tables, warm_up_pool
 from app.api.v1 import blogs, recommendations
 from app import crud
+from app.services.booking_service import close_booking_http_client
+from app.services.chatgpt_service import close_openai_client
+from app.utils.cache import close_redis_client
 from app.utils.mock_data import get_mock_blog_posts
 # Import models to ensure they're registered with SQLAlchemy
 from app.models import BlogPost, Hotel  # noqa: F401
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 # Initialize with mock data if database is empty
-def init_mock_data():
+async def init_mock_data():
     """Initialize database with mock blog posts if empty"""
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         # Check if database is empty
-        existing_posts = crud.blog.get_blog_posts(db, skip=0, limit=1)
-        if len(existing_posts) == 0:
-            # Add mock data
-            mock_posts = get_mock_blog_posts()
-            for post_data in mock_posts:
-                crud.blog.create_blog_post(db=db, post=post_data)
-            print(f"Initialized database with {len(mock_posts)} mock blog posts")
-    finally:
-        db.close()
+        if await crud.blog.count_blog_posts(db) == 0:
+            # Add mock data (no-op for posts another worker inserted meanwhile)
+            inserted = await crud.blog.seed_blog_posts(db, get_mock_blog_posts())
+            if inserted:
+                print(f"Initialized database with {inserted} mock blog posts")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create database tables, seed mock data and warm up the connection pool on startup;
+    close shared clients and the pool on shutdown (clients are recreated on next use)
+    """
+    await create_tables()
+    await init_mock_data()
+    await warm_up_pool()
+    yield
+    await close_openai_client()
+    await close_booking_http_client()
+    await close_redis_client()
+    await engine.dispose()
 
-# Initialize mock data on startup
-init_mock_data()
 
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
     debug=settings.debug,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # CORS middleware
@@ -60,6 +74,8 @@ def root():
 
 
 @app.get("/health")
-def health_check():
-    return {"status": "healthy"}
+async def health_check():
+    if not await check_db_connection():
+        return JSONResponse(status_code=503, content={"status": "unhealthy", "database": "unavailable"})
+    return {"status": "healthy", "database": "ok"}
 
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, JSON, DateTime
+from sqlalchemy import Column, String, JSON, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -7,11 +8,16 @@ class Hotel(Base):
     """Hotel model to store booking.com API response data"""
     __tablename__ = "hotels"
     
-    hotel_id = Column(String, primary_key=True, index=True, nullable=False)
-    booking_data = Column(JSON, nullable=False)  # Full booking.com API response as JSON
+    # Booking.com ids are short integer-strings; the primary key index already covers lookups
+    hotel_id = Column(String(64), primary_key=True, nullable=False)
+    # Full booking.com API response as JSON (JSONB on PostgreSQL)
+    booking_data = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
+    __table_args__ = (
+        Index("ix_hotels_updated_at", updated_at),
+    )
+    
     def __repr__(self):
         return f"<Hotel(hotel_id={self.hotel_id}, name={self.booking_data.get('name', 'Unknown') if isinstance(self.booking_data, dict) else 'N/A'})>"
-
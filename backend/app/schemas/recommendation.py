@@ -6,6 +6,11 @@ from datetime import datetime
 class RecommendationRequest(BaseModel):
     """Request schema for hotel recommendation"""
     user_demand: str = Field(..., description="User's natural language demand for hotel search")
+
+
+class BatchExtractionRequest(BaseModel):
+    """Request schema for extracting search parameters from several demands at once"""
+    user_demands: List[str] = Field(..., max_length=100, description="User demands, e.g. the legs of a multi-stop trip")
     
 
 class SearchParameters(BaseModel):
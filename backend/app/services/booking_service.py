@@ -1,28 +1,417 @@
 """
 Booking.com API service for fetching hotel data
 """
+import asyncio
 import logging
 import hashlib
-from typing import Dict, List, Any, Optional
+import random
+import re
+from functools import cache, lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping, Optional, Tuple
 from datetime import datetime, timedelta
 import httpx
+import numpy as np
+import orjson
+from cachetools import TTLCache
 from app.config import settings
 from app.schemas.recommendation import SearchParameters
+from app.utils.cache import SingleFlight, get_redis_client
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1)
+def get_booking_http_client() -> httpx.AsyncClient:
+    """
+    Long-lived client shared by all searches so Booking.com connections are kept alive
+    between requests instead of paying a TCP+TLS handshake per call. Created on first use,
+    and again after close_booking_http_client (e.g. when the app restarts)
+    """
+    return httpx.AsyncClient(
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=100),
+        headers={"Accept": "application/json"},
+    )
+
+
+async def close_booking_http_client() -> None:
+    """Close the shared Booking.com client's connections on shutdown"""
+    if get_booking_http_client.cache_info().currsize:
+        await get_booking_http_client().aclose()
+    get_booking_http_client.cache_clear()
+
+
+# Concurrent cache misses for the same search share one Booking.com call
+_inflight_searches = SingleFlight()
+
+# Invariant part of each mock hotel, built once at import; only the location-specific
+# fields are filled in per request (amenities/images lists are shared and read-only)
+_HOTEL_TEMPLATES: Tuple[Dict[str, Any], ...] = (
+    {
+        "slug": "luxury_1",
+        "name_fmt": "Grand Palace Hotel {loc}",
+        "address_fmt": "1 Champs-Élysées, {loc}",
+        "price": 350.0,
+        "currency": "EUR",
+        "rating": 4.9,
+        "review_score": 9.5,
+        "review_count": 2340,
+        "amenities": ["WiFi", "Pool", "Spa", "Fitness Center", "Restaurant", "Bar", "Room Service", "Concierge", "Valet Parking", "Business Center"],
+        "desc_fmt": "Luxurious 5-star hotel in the heart of {loc}. Features elegant rooms, world-class spa, fine dining, and exceptional service. Perfect for business travelers and romantic getaways.",
+        "images": [
+            "https://images.unsplash.com/photo-1566073771259-6a8506099945?w=800&h=600&fit=crop",
+            "https://images.unsplash.com/photo-1551882547-ff40c63fe5fa?w=800&h=600&fit=crop",
+            "https://images.unsplash.com/photo-1571896349842-33c89424de2d?w=800&h=600&fit=crop"
+        ],
+    },
+    {
+        "slug": "resort_1",
+        "name_fmt": "Seaside Luxury Resort {loc}",
+        "address_fmt": "Beach Boulevard, {loc}",
+        "price": 280.0,
+        "currency": "EUR",
+        "rating": 4.7,
+        "review_score": 9.1,
+        "review_count": 1890,
+        "amenities": ["WiFi", "Pool", "Spa", "Beach Access", "Restaurant", "Bar", "Water Sports", "Kids Club", "Beach Bar", "Tennis Court"],
+        "desc_fmt": "Stunning beachfront resort in {loc} with direct beach access. Features infinity pool, spa, multiple restaurants, and water sports. Ideal for families and couples seeking relaxation.",
+        "images": [
+            "https://images.unsplash.com/photo-1571003123894-1f0594d2b5d9?w=800&h=600&fit=crop",
+            "https://images.unsplash.com/photo-1582719478250-c89cae4dc85b?w=800&h=600&fit=crop",
+            "https://images.unsplash.com/photo-1551882547-ff40c63fe5fa?w=800&h=600&fit=crop"
+        ],
+    },
+    {
+        "slug": "boutique_1",
+        "name_fmt": "Romantic Boutique Hotel {loc}",
+        "address_fmt": "Rue de la Romance, {loc}",
+        "price": 180.0,
+        "currency": "EUR",
+        "rating": 4.6,
+        "review_score": 8.9,
+        "review_count": 1450,
+        "amenities": ["WiFi", "Spa", "Restaurant", "Bar", "Romantic Packages", "Couples Massage", "Rooftop Terrace", "Wine Bar"],
+        "desc_fmt": "Charming boutique hotel in {loc} perfect for romantic getaways. Intimate atmosphere, beautifully designed rooms, spa services, and fine dining. Highly rated by couples.",
+        "images": [
+            "https://images.unsplash.com/photo-1590490360182-c33d57733427?w=800&h=600&fit=crop",
+            "https://images.unsplash.com/photo-1564501049412-61c2a3083791?w=800&h=600&fit=crop",
+            "https://images.unsplash.com/photo-1571896349842-33c89424de2d?w=800&h=600&fit=crop"
+        ],
+    },
+    {
+        "slug": "business_1",
+        "name_fmt": "Business Center Hotel {loc}",
+        "address_fmt": "Financial District, {loc}",
+        "price": 220.0,
+        "currency": "EUR",
+        "rating": 4.4,
+        "review_score": 8.6,
+        "review_count": 2100,
+        "amenities": ["WiFi", "Business Center", "Meeting Rooms", "Fitness Center", "Restaurant", "Bar", "Airport Shuttle", "Concierge", "Laundry Service"],
+        "desc_fmt": "Modern business hotel in {loc}'s financial district. Well-equipped meeting facilities, high-speed WiFi, fitness center, and convenient location for corporate travelers.",
+        "images": [
+            "https://images.unsplash.com/photo-1566073771259-6a8506099945?w=800&h=600&fit=crop",
+            "https://images.unsplash.com/photo-1590490360182-c33d57733427?w=800&h=600&fit=crop"
+        ],
+    },
+    {
+        "slug": "family_1",
+        "name_fmt": "Family Resort {loc}",
+        "address_fmt": "Family Street, {loc}",
+        "price": 160.0,
+        "currency": "EUR",
+        "rating": 4.5,
+        "review_score": 8.7,
+        "review_count": 3200,
+        "amenities": ["WiFi", "Pool", "Kids Club", "Playground", "Family Rooms", "Restaurant", "Bar", "Entertainment", "Game Room", "Babysitting"],
+        "desc_fmt": "Family-friendly resort in {loc} with extensive facilities for children. Large pool, kids club, playground, family rooms, and entertainment. Perfect for families with children.",
+        "images": [
+            "https://images.unsplash.com/photo-1571003123894-1f0594d2b5d9?w=800&h=600&fit=crop",
+            "https://images.unsplash.com/photo-1564501049412-61c2a3083791?w=800&h=600&fit=crop"
+        ],
+    },
+    {
+        "slug": "mid_1",
+        "name_fmt": "Comfort Inn {loc}",
+        "address_fmt": "Main Avenue, {loc}",
+        "price": 120.0,
+        "currency": "EUR",
+        "rating": 4.2,
+        "review_score": 8.3,
+        "review_count": 1850,
+        "amenities": ["WiFi", "Pool", "Restaurant", "Bar", "Parking", "Fitness Center"],
+        "desc_fmt": "Comfortable mid-range hotel in {loc} with good value. Clean rooms, pool, restaurant, and convenient location. Great for travelers seeking comfort without luxury prices.",
+        "images": [
+            "https://images.unsplash.com/photo-1590490360182-c33d57733427?w=800&h=600&fit=crop",
+            "https://images.unsplash.com/photo-1566073771259-6a8506099945?w=800&h=600&fit=crop"
+        ],
+    },
+    {
+        "slug": "spa_1",
+        "name_fmt": "Wellness Spa Hotel {loc}",
+        "address_fmt": "Relaxation Road, {loc}",
+        "price": 200.0,
+        "currency": "EUR",
+        "rating": 4.6,
+        "review_score": 8.8,
+        "review_count": 1650,
+        "amenities": ["WiFi", "Spa", "Wellness Center", "Massage", "Sauna", "Steam Room", "Yoga Classes", "Restaurant", "Bar", "Pool"],
+        "desc_fmt": "Dedicated wellness and spa hotel in {loc}. Extensive spa facilities, massage services, sauna, steam room, yoga classes, and healthy dining options. Perfect for relaxation and rejuvenation.",
+        "images": [
+            "https://images.unsplash.com/photo-1571896349842-33c89424de2d?w=800&h=600&fit=crop",
+            "https://images.unsplash.com/photo-1582719478250-c89cae4dc85b?w=800&h=600&fit=crop"
+        ],
+    },
+    {
+        "slug": "budget_1",
+        "name_fmt": "Budget Inn {loc}",
+        "address_fmt": "Economy Street, {loc}",
+        "price": 65.0,
+        "currency": "EUR",
+        "rating": 3.8,
+        "review_score": 7.6,
+        "review_count": 2800,
+        "amenities": ["WiFi", "Parking", "24-Hour Reception"],
+        "desc_fmt": "Affordable budget accommodation in {loc}. Basic but clean rooms, free WiFi, parking available. Great value for money-conscious travelers.",
+        "images": [
+            "https://images.unsplash.com/photo-1590490360182-c33d57733427?w=800&h=600&fit=crop",
+            "https://images.unsplash.com/photo-1564501049412-61c2a3083791?w=800&h=600&fit=crop"
+        ],
+    },
+    {
+        "slug": "historic_1",
+        "name_fmt": "Historic Grand Hotel {loc}",
+        "address_fmt": "Historic Square, {loc}",
+        "price": 240.0,
+        "currency": "EUR",
+        "rating": 4.7,
+        "review_score": 9.0,
+        "review_count": 1950,
+        "amenities": ["WiFi", "Historic Building", "Restaurant", "Bar", "Concierge", "Room Service", "Fitness Center"],
+        "desc_fmt": "Beautifully restored historic hotel in the center of {loc}. Combines classic architecture with modern amenities. Elegant rooms, fine dining, and rich history.",
+        "images": [
+            "https://images.unsplash.com/photo-1566073771259-6a8506099945?w=800&h=600&fit=crop",
+            "https://images.unsplash.com/photo-1551882547-ff40c63fe5fa?w=800&h=600&fit=crop"
+        ],
+    },
+    {
+        "slug": "eco_1",
+        "name_fmt": "Eco-Friendly Hotel {loc}",
+        "address_fmt": "Green Boulevard, {loc}",
+        "price": 140.0,
+        "currency": "EUR",
+        "rating": 4.4,
+        "review_score": 8.5,
+        "review_count": 1200,
+        "amenities": ["WiFi", "Eco-Friendly", "Organic Restaurant", "Bike Rental", "Solar Power", "Recycling", "Garden"],
+        "desc_fmt": "Environmentally conscious hotel in {loc}. Sustainable practices, organic restaurant, bike rental, solar power. Perfect for eco-conscious travelers.",
+        "images": [
+            "https://images.unsplash.com/photo-1564501049412-61c2a3083791?w=800&h=600&fit=crop",
+            "https://images.unsplash.com/photo-1590490360182-c33d57733427?w=800&h=600&fit=crop"
+        ],
+    },
+)
+
+# Coordinates of common locations for mock data (read-only, shared by every hotel built from them)
+_LOCATION_COORDS: Mapping[str, Dict[str, float]] = MappingProxyType({
+    "paris": {"lat": 48.8566, "lng": 2.3522},
+    "rome": {"lat": 41.9028, "lng": 12.4964},
+    "london": {"lat": 51.5074, "lng": -0.1278},
+    "barcelona": {"lat": 41.3851, "lng": 2.1734},
+    "amsterdam": {"lat": 52.3676, "lng": 4.9041},
+    "berlin": {"lat": 52.5200, "lng": 13.4050},
+    "vienna": {"lat": 48.2082, "lng": 16.3738},
+    "prague": {"lat": 50.0755, "lng": 14.4378},
+    "madrid": {"lat": 40.4168, "lng": -3.7038},
+    "milan": {"lat": 45.4642, "lng": 9.1900},
+    "venice": {"lat": 45.4408, "lng": 12.3155},
+    "florence": {"lat": 43.7696, "lng": 11.2558},
+    "italy": {"lat": 41.8719, "lng": 12.5674},
+    "france": {"lat": 46.2276, "lng": 2.2137},
+    "spain": {"lat": 40.4637, "lng": -3.7492},
+})
+_DEFAULT_COORDS: Dict[str, float] = _LOCATION_COORDS["paris"]
+
+
+@lru_cache(maxsize=256)
+def _coordinates_for_location(location: str) -> Dict[str, float]:
+    """Exact match first, then the first known location contained in location (Paris by default)"""
+    coords = _LOCATION_COORDS.get(location)
+    if coords is not None:
+        return coords
+    for key, coords in _LOCATION_COORDS.items():
+        if key in location:
+            return coords
+    return _DEFAULT_COORDS
+
+
+@lru_cache(maxsize=256)
+def _coordinate_offsets(location: str) -> Tuple[Tuple[float, float], ...]:
+    """
+    Per-template (lat, lng) offsets for location, seeded from a stable digest so
+    every worker places the same hotel at the same spot (hash() is salted per process)
+    """
+    seed = int.from_bytes(hashlib.blake2b(location.encode(), digest_size=8).digest(), "little")
+    rng = random.Random(seed)
+    return tuple((rng.uniform(-0.01, 0.01), rng.uniform(-0.01, 0.01)) for _ in _HOTEL_TEMPLATES)
+
+
+# Preference tags a mock hotel can satisfy (bits of the catalog tag mask)
+_TAG_LUXURY, _TAG_BUDGET, _TAG_ROMANTIC, _TAG_FAMILY, _TAG_BUSINESS, _TAG_BEACH, _TAG_POOL, _TAG_SPA = (
+    1 << bit for bit in range(8)
+)
+
+# Preference keywords mapped to the tag they ask for
+_PREF_KEYWORDS: Dict[str, int] = {
+    "luxury": _TAG_LUXURY, "premium": _TAG_LUXURY,
+    "budget": _TAG_BUDGET, "cheap": _TAG_BUDGET, "affordable": _TAG_BUDGET,
+    "romantic": _TAG_ROMANTIC, "couple": _TAG_ROMANTIC,
+    "family": _TAG_FAMILY, "kids": _TAG_FAMILY,
+    "business": _TAG_BUSINESS, "corporate": _TAG_BUSINESS,
+    "beach": _TAG_BEACH, "seaside": _TAG_BEACH,
+    "pool": _TAG_POOL,
+    "spa": _TAG_SPA, "wellness": _TAG_SPA,
+}
+
+# Number of set bits for every 8-bit tag combination
+_POPCOUNT = np.array([bin(tags).count("1") for tags in range(256)], dtype=np.int32)
+
+
+def _template_tags(template: Dict[str, Any]) -> int:
+    """Preference tags of a hotel template, from its rating, price, name, description and amenities"""
+    name_desc = f"{template['name_fmt']} {template['desc_fmt']}".format(loc="").lower()
+    amenities = " ".join(a.lower() for a in template["amenities"])
+    tags = 0
+    if template["rating"] >= 4.5 or "luxury" in name_desc:
+        tags |= _TAG_LUXURY
+    if template["price"] <= 100:
+        tags |= _TAG_BUDGET
+    if "romantic" in name_desc or "boutique" in name_desc or "spa" in amenities:
+        tags |= _TAG_ROMANTIC
+    if "family" in name_desc or "kids" in amenities:
+        tags |= _TAG_FAMILY
+    if "business" in name_desc or "business" in amenities:
+        tags |= _TAG_BUSINESS
+    if "beach" in name_desc or "beach" in amenities:
+        tags |= _TAG_BEACH
+    if "pool" in amenities:
+        tags |= _TAG_POOL
+    if "spa" in amenities or "wellness" in amenities:
+        tags |= _TAG_SPA
+    return tags
+
+
+@cache
+def _mock_catalog() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Build the mock catalog indexes on first use, so deployments that only call the
+    real Booking.com API never pay for them
+    
+    Returns:
+        (price_order, sorted_prices, tags): template indices sorted by price (a budget range
+        is one binary-searched slice), their prices, and each template's tag bitmask
+    """
+    # Structure-of-arrays view of _HOTEL_TEMPLATES, so filtering and scoring are vectorized
+    prices = np.array([t["price"] for t in _HOTEL_TEMPLATES], dtype=np.float64)
+    tags = np.array([_template_tags(t) for t in _HOTEL_TEMPLATES], dtype=np.uint32)
+    price_order = np.argsort(prices, kind="stable")
+    return price_order, prices[price_order], tags
+
+
+_URL_PREFIX = "https://booking.com/hotel/"
+
+# Known city/country words mapped to their country for mock data
+_CITY_TO_COUNTRY: Dict[str, str] = {
+    "paris": "France", "lyon": "France", "nice": "France", "marseille": "France", "france": "France",
+    "rome": "Italy", "milan": "Italy", "venice": "Italy", "florence": "Italy", "italy": "Italy", "naples": "Italy",
+    "london": "United Kingdom", "manchester": "United Kingdom", "edinburgh": "United Kingdom",
+    "uk": "United Kingdom", "england": "United Kingdom",
+    "barcelona": "Spain", "madrid": "Spain", "seville": "Spain", "spain": "Spain",
+    "berlin": "Germany", "munich": "Germany", "frankfurt": "Germany", "germany": "Germany",
+    "amsterdam": "Netherlands", "netherlands": "Netherlands", "holland": "Netherlands",
+    "vienna": "Austria", "austria": "Austria",
+    "prague": "Czech Republic", "czech": "Czech Republic",
+}
+_WORD = re.compile(r"[a-z]+")
+
+
+@lru_cache(maxsize=512)
+def _country_for_location(location_lower: str) -> str:
+    """Country of the first known word in location_lower (France by default)"""
+    return next(
+        (_CITY_TO_COUNTRY[word] for word in _WORD.findall(location_lower) if word in _CITY_TO_COUNTRY),
+        "France"
+    )
+
+
+def _generate_mock_hotels(
+    location: str,
+    coords: Dict[str, float],
+    country: str,
+    query_hash: str
+) -> List[Dict[str, Any]]:
+    """One mock hotel per template for location, in catalog order"""
+    base_lat = coords["lat"]
+    base_lng = coords["lng"]
+    
+    # Small variations to coordinates for different hotels, consistent across workers
+    offsets = _coordinate_offsets(location)
+    
+    hotels = [
+        {
+            "hotel_id": (hotel_id := query_hash + "_" + t["slug"]),
+            "name": t["name_fmt"].format(loc=location),
+            "address": t["address_fmt"].format(loc=location),
+            "city": location,
+            "country": country,
+            "latitude": base_lat + lat_offset,
+            "longitude": base_lng + lng_offset,
+            "price": t["price"],
+            "currency": t["currency"],
+            "rating": t["rating"],
+            "review_score": t["review_score"],
+            "review_count": t["review_count"],
+            "amenities": t["amenities"],
+            "description": t["desc_fmt"].format(loc=location),
+            "images": t["images"],
+            "url": _URL_PREFIX + hotel_id
+        }
+        for t, (lat_offset, lng_offset) in zip(_HOTEL_TEMPLATES, offsets)
+    ]
+    
+    return hotels
+
+
+@lru_cache(maxsize=128)
+def _browse_mock_hotels(location: str, query_hash: str) -> Tuple[Dict[str, Any], ...]:
+    """Memoized mock hotels for browse queries (no budget or preferences)"""
+    location_lower = location.lower()
+    return tuple(_generate_mock_hotels(
+        location, _coordinates_for_location(location_lower), _country_for_location(location_lower), query_hash
+    ))
+
+
+# Per-process memo of search results (mock or API) for identical SearchParameters
+_recent_searches: TTLCache = TTLCache(maxsize=1024, ttl=settings.hotel_search_cache_ttl)
+
+
 class BookingService:
     """Service for interacting with Booking.com API"""
     
+    # SearchParameters fields sent to the Booking.com API (preferences only affect mock data)
+    API_SEARCH_FIELDS = (
+        "location", "check_in", "check_out", "budget_min", "budget_max", "adults", "children", "rooms"
+    )
+    
     def __init__(self):
         self.api_key = settings.booking_api_key
         self.base_url = settings.booking_api_url
-        self.timeout = 30.0
     
-    def search_hotels(self, parameters: SearchParameters) -> List[Dict[str, Any]]:
+    async def search_hotels(self, parameters: SearchParameters) -> List[Dict[str, Any]]:
         """
-        Search hotels using Booking.com API
+        Search hotels using Booking.com API over the shared get_booking_http_client(),
+        so the event loop is free while waiting on Booking.com
         
         Args:
             parameters: SearchParameters object with search criteria
@@ -30,43 +419,128 @@ class BookingService:
         Returns:
             List of hotel dictionaries from Booking.com API
         """
+        memo_key = self._memo_key(parameters)
+        hotels = _recent_searches.get(memo_key)
+        if hotels is not None:
+            return hotels
+        
         if not self.api_key:
             logger.warning("Booking.com API key not configured. Returning mock data.")
-            return self._get_mock_hotels(parameters)
+            hotels = self._get_mock_hotels(parameters)
+        else:
+            try:
+                hotels = await self._search_booking_api(parameters)
+            except httpx.HTTPError as e:
+                logger.error(f"Error calling Booking.com API: {e}")
+                # Fallback to mock data on error (not memoized, so the next call retries the API)
+                return self._get_mock_hotels(parameters)
+            except Exception as e:
+                logger.error(f"Unexpected error in Booking.com API call: {e}")
+                return self._get_mock_hotels(parameters)
         
+        _recent_searches[memo_key] = hotels
+        return hotels
+    
+    async def _search_booking_api(self, parameters: SearchParameters) -> List[Dict[str, Any]]:
+        """Booking.com results for parameters, via the shared Redis cache when configured"""
+        key = self._search_cache_key(parameters)
+        cached = await self._get_cached_search(key)
+        if cached is not None:
+            logger.info("Booking.com cache hit: %d hotels", len(cached))
+            return cached
+        
+        return await _inflight_searches.do(
+            key, lambda: self._fetch_and_cache_hotels(key, parameters)
+        )
+    
+    async def _fetch_and_cache_hotels(self, key: str, parameters: SearchParameters) -> List[Dict[str, Any]]:
+        """Call Booking.com for parameters and store the raw result under key"""
+        params = self._prepare_search_params(parameters)
+        
+        # Fetch all result pages at once; the first failure cancels the remaining pages
         try:
-            # Prepare API request parameters
-            params = self._prepare_search_params(parameters)
-            
-            # Make API request
-            # Note: This is a placeholder - actual Booking.com API endpoints may vary
-            # You'll need to adjust based on Booking.com's actual API documentation
-            with httpx.Client(timeout=self.timeout) as client:
-                headers = {
-                    "Accept": "application/json",
-                    "Authorization": f"Bearer {self.api_key}"  # Adjust based on actual auth method
-                }
-                
-                # Example endpoint - adjust based on actual Booking.com API
-                response = client.get(
-                    f"{self.base_url}/hotels",
-                    headers=headers,
-                    params=params
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                hotels = data.get("result", [])
-                logger.info(f"Found {len(hotels)} hotels from Booking.com API")
-                return hotels
-                
-        except httpx.HTTPError as e:
-            logger.error(f"Error calling Booking.com API: {e}")
-            # Fallback to mock data on error
-            return self._get_mock_hotels(parameters)
+            async with asyncio.TaskGroup() as group:
+                pages = [
+                    group.create_task(self._fetch_page(params, page))
+                    for page in range(1, settings.booking_search_pages + 1)
+                ]
+        except ExceptionGroup as e:
+            # Re-raise the first failure so callers can handle httpx.HTTPError as before
+            raise e.exceptions[0]
+        
+        hotels = self._merge_pages([page.result() for page in pages])
+        logger.info("Found %d hotels from Booking.com API", len(hotels))
+        
+        await self._set_cached_search(key, hotels)
+        return hotels
+    
+    async def _fetch_page(self, params: Dict[str, Any], page: int) -> List[Dict[str, Any]]:
+        """Fetch one page of Booking.com hotel results"""
+        # Note: This is a placeholder - actual Booking.com API endpoints may vary
+        response = await get_booking_http_client().get(
+            f"{self.base_url}/hotels",
+            headers={"Authorization": f"Bearer {self.api_key}"},  # Adjust based on actual auth method
+            params={**params, "page": page}
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content).get("result", [])
+    
+    @staticmethod
+    def _merge_pages(pages: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Flatten concurrently fetched pages in order, dropping duplicate hotel IDs.
+        A page shorter than the first is the last one: later pages lie past the end
+        of the results (which some APIs answer by repeating the last page)
+        """
+        hotels = []
+        seen_ids = set()
+        for page in pages:
+            for hotel in page:
+                hotel_id = hotel.get("hotel_id")
+                if hotel_id is None or hotel_id not in seen_ids:
+                    seen_ids.add(hotel_id)
+                    hotels.append(hotel)
+            if len(page) < len(pages[0]) or not page:
+                break
+        return hotels
+
+    @staticmethod
+    def _memo_key(parameters: SearchParameters) -> Tuple[Any, ...]:
+        """Every search field, preferences included (order- and case-insensitive) since they shape mock results"""
+        return (
+            (parameters.location or "").lower(), parameters.check_in, parameters.check_out,
+            parameters.adults, parameters.children, parameters.rooms,
+            parameters.budget_min, parameters.budget_max,
+            frozenset(map(str.lower, parameters.preferences or ())),
+        )
+    
+    def _search_cache_key(self, parameters: SearchParameters) -> str:
+        """Cache key for the Booking.com fields of parameters (canonical, order-independent)"""
+        fields = parameters.model_dump(include=set(self.API_SEARCH_FIELDS), exclude_none=True)
+        digest = hashlib.sha1(orjson.dumps(fields, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        return f"booking:{digest}"
+    
+    async def _get_cached_search(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Read a cached Booking.com response; cache errors are treated as misses"""
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return None
+        try:
+            cached = await redis_client.get(key)
+        except Exception as e:
+            logger.warning("Booking.com cache read failed: %s", e)
+            return None
+        return orjson.loads(cached) if cached else None
+    
+    async def _set_cached_search(self, key: str, hotels: List[Dict[str, Any]]) -> None:
+        """Store a Booking.com response for settings.booking_cache_ttl seconds"""
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return
+        try:
+            await redis_client.setex(key, settings.booking_cache_ttl, orjson.dumps(hotels))
         except Exception as e:
-            logger.error(f"Unexpected error in Booking.com API call: {e}")
-            return self._get_mock_hotels(parameters)
+            logger.warning("Booking.com cache write failed: %s", e)
     
     def _prepare_search_params(self, parameters: SearchParameters) -> Dict[str, Any]:
         """Prepare search parameters for Booking.com API"""
@@ -104,375 +578,91 @@ class BookingService:
         Hotels vary based on location, budget, and preferences
         """
         location = parameters.location or "Paris"
-        location_lower = location.lower()
-        
-        # Determine location coordinates based on city
-        location_coords = self._get_location_coordinates(location_lower)
         
         # Generate unique hotel IDs based on query to avoid caching issues
-        query_hash = hashlib.md5(
-            f"{location}_{parameters.budget_min}_{parameters.budget_max}_{parameters.preferences}".encode()
-        ).hexdigest()[:8]
+        query_hash = hashlib.blake2b(
+            f"{location}|{parameters.budget_min}|{parameters.budget_max}|{parameters.preferences}".encode(),
+            digest_size=4
+        ).hexdigest()
         
-        # Get all available mock hotels for this location
-        all_hotels = self._generate_mock_hotel_database(location, location_coords, query_hash)
-        
-        # Filter hotels based on search parameters
-        filtered_hotels = self._filter_mock_hotels(all_hotels, parameters)
+        if not parameters.preferences and not parameters.budget_min and not parameters.budget_max:
+            # Plain browse query: nothing to filter or rank, so reuse the built catalog
+            filtered_hotels = list(_browse_mock_hotels(location, query_hash)[:12])
+        else:
+            # Get all available mock hotels for this location
+            all_hotels = self._build_mock_hotels(location, query_hash)
+            
+            # Filter hotels based on search parameters
+            filtered_hotels = self._filter_mock_hotels(all_hotels, parameters)
         
         logger.info(f"Returning {len(filtered_hotels)} mock hotels for location: {location}")
         return filtered_hotels
     
+    def _build_mock_hotels(self, location: str, query_hash: str) -> List[Dict[str, Any]]:
+        """All mock hotels for location, in catalog order"""
+        # Determine location coordinates based on city
+        location_coords = self._get_location_coordinates(location.lower())
+        country = self._get_country_from_location(location)
+        return self._generate_mock_hotel_database(location, location_coords, country, query_hash)
+    
     def _get_location_coordinates(self, location: str) -> Dict[str, float]:
         """Get coordinates for common locations"""
-        location_map = {
-            "paris": {"lat": 48.8566, "lng": 2.3522},
-            "rome": {"lat": 41.9028, "lng": 12.4964},
-            "london": {"lat": 51.5074, "lng": -0.1278},
-            "barcelona": {"lat": 41.3851, "lng": 2.1734},
-            "amsterdam": {"lat": 52.3676, "lng": 4.9041},
-            "berlin": {"lat": 52.5200, "lng": 13.4050},
-            "vienna": {"lat": 48.2082, "lng": 16.3738},
-            "prague": {"lat": 50.0755, "lng": 14.4378},
-            "madrid": {"lat": 40.4168, "lng": -3.7038},
-            "milan": {"lat": 45.4642, "lng": 9.1900},
-            "venice": {"lat": 45.4408, "lng": 12.3155},
-            "florence": {"lat": 43.7696, "lng": 11.2558},
-            "italy": {"lat": 41.8719, "lng": 12.5674},
-            "france": {"lat": 46.2276, "lng": 2.2137},
-            "spain": {"lat": 40.4637, "lng": -3.7492},
-        }
-        
-        # Try to find matching location
-        for key, coords in location_map.items():
-            if key in location:
-                return coords
-        
-        # Default to Paris coordinates
-        return {"lat": 48.8566, "lng": 2.3522}
+        return _coordinates_for_location(location)
     
     def _generate_mock_hotel_database(
         self, 
         location: str, 
         coords: Dict[str, float],
+        country: str,
         query_hash: str
     ) -> List[Dict[str, Any]]:
         """Generate a comprehensive database of mock hotels"""
-        base_lat = coords["lat"]
-        base_lng = coords["lng"]
-        
-        # Add small deterministic variations to coordinates for different hotels
-        # Use hash of location to create consistent but varied offsets
-        location_hash = hash(location) % 10000
-        
-        def get_coord_offset(index: int, coord_type: str) -> float:
-            """Get deterministic coordinate offset for hotel"""
-            multiplier = 100 if coord_type == "lat" else 200
-            return ((location_hash + index * multiplier) % 200 - 100) / 10000.0
-        
-        hotels = [
-            {
-                "hotel_id": f"{query_hash}_luxury_1",
-                "name": f"Grand Palace Hotel {location}",
-                "address": f"1 Champs-Élysées, {location}",
-                "city": location,
-                "country": self._get_country_from_location(location),
-                "latitude": base_lat + get_coord_offset(0, "lat"),
-                "longitude": base_lng + get_coord_offset(0, "lng"),
-                "price": 350.0,
-                "currency": "EUR",
-                "rating": 4.9,
-                "review_score": 9.5,
-                "review_count": 2340,
-                "amenities": ["WiFi", "Pool", "Spa", "Fitness Center", "Restaurant", "Bar", "Room Service", "Concierge", "Valet Parking", "Business Center"],
-                "description": f"Luxurious 5-star hotel in the heart of {location}. Features elegant rooms, world-class spa, fine dining, and exceptional service. Perfect for business travelers and romantic getaways.",
-                "images": [
-                    "https://images.unsplash.com/photo-1566073771259-6a8506099945?w=800&h=600&fit=crop",
-                    "https://images.unsplash.com/photo-1551882547-ff40c63fe5fa?w=800&h=600&fit=crop",
-                    "https://images.unsplash.com/photo-1571896349842-33c89424de2d?w=800&h=600&fit=crop"
-                ],
-                "url": f"https://booking.com/hotel/{query_hash}_luxury_1"
-            },
-            {
-                "hotel_id": f"{query_hash}_resort_1",
-                "name": f"Seaside Luxury Resort {location}",
-                "address": f"Beach Boulevard, {location}",
-                "city": location,
-                "country": self._get_country_from_location(location),
-                "latitude": base_lat + get_coord_offset(1, "lat"),
-                "longitude": base_lng + get_coord_offset(1, "lng"),
-                "price": 280.0,
-                "currency": "EUR",
-                "rating": 4.7,
-                "review_score": 9.1,
-                "review_count": 1890,
-                "amenities": ["WiFi", "Pool", "Spa", "Beach Access", "Restaurant", "Bar", "Water Sports", "Kids Club", "Beach Bar", "Tennis Court"],
-                "description": f"Stunning beachfront resort in {location} with direct beach access. Features infinity pool, spa, multiple restaurants, and water sports. Ideal for families and couples seeking relaxation.",
-                "images": [
-                    "https://images.unsplash.com/photo-1571003123894-1f0594d2b5d9?w=800&h=600&fit=crop",
-                    "https://images.unsplash.com/photo-1582719478250-c89cae4dc85b?w=800&h=600&fit=crop",
-                    "https://images.unsplash.com/photo-1551882547-ff40c63fe5fa?w=800&h=600&fit=crop"
-                ],
-                "url": f"https://booking.com/hotel/{query_hash}_resort_1"
-            },
-            {
-                "hotel_id": f"{query_hash}_boutique_1",
-                "name": f"Romantic Boutique Hotel {location}",
-                "address": f"Rue de la Romance, {location}",
-                "city": location,
-                "country": self._get_country_from_location(location),
-                "latitude": base_lat + get_coord_offset(2, "lat"),
-                "longitude": base_lng + get_coord_offset(2, "lng"),
-                "price": 180.0,
-                "currency": "EUR",
-                "rating": 4.6,
-                "review_score": 8.9,
-                "review_count": 1450,
-                "amenities": ["WiFi", "Spa", "Restaurant", "Bar", "Romantic Packages", "Couples Massage", "Rooftop Terrace", "Wine Bar"],
-                "description": f"Charming boutique hotel in {location} perfect for romantic getaways. Intimate atmosphere, beautifully designed rooms, spa services, and fine dining. Highly rated by couples.",
-                "images": [
-                    "https://images.unsplash.com/photo-1590490360182-c33d57733427?w=800&h=600&fit=crop",
-                    "https://images.unsplash.com/photo-1564501049412-61c2a3083791?w=800&h=600&fit=crop",
-                    "https://images.unsplash.com/photo-1571896349842-33c89424de2d?w=800&h=600&fit=crop"
-                ],
-                "url": f"https://booking.com/hotel/{query_hash}_boutique_1"
-            },
-            {
-                "hotel_id": f"{query_hash}_business_1",
-                "name": f"Business Center Hotel {location}",
-                "address": f"Financial District, {location}",
-                "city": location,
-                "country": self._get_country_from_location(location),
-                "latitude": base_lat + get_coord_offset(3, "lat"),
-                "longitude": base_lng + get_coord_offset(3, "lng"),
-                "price": 220.0,
-                "currency": "EUR",
-                "rating": 4.4,
-                "review_score": 8.6,
-                "review_count": 2100,
-                "amenities": ["WiFi", "Business Center", "Meeting Rooms", "Fitness Center", "Restaurant", "Bar", "Airport Shuttle", "Concierge", "Laundry Service"],
-                "description": f"Modern business hotel in {location}'s financial district. Well-equipped meeting facilities, high-speed WiFi, fitness center, and convenient location for corporate travelers.",
-                "images": [
-                    "https://images.unsplash.com/photo-1566073771259-6a8506099945?w=800&h=600&fit=crop",
-                    "https://images.unsplash.com/photo-1590490360182-c33d57733427?w=800&h=600&fit=crop"
-                ],
-                "url": f"https://booking.com/hotel/{query_hash}_business_1"
-            },
-            {
-                "hotel_id": f"{query_hash}_family_1",
-                "name": f"Family Resort {location}",
-                "address": f"Family Street, {location}",
-                "city": location,
-                "country": self._get_country_from_location(location),
-                "latitude": base_lat + get_coord_offset(4, "lat"),
-                "longitude": base_lng + get_coord_offset(4, "lng"),
-                "price": 160.0,
-                "currency": "EUR",
-                "rating": 4.5,
-                "review_score": 8.7,
-                "review_count": 3200,
-                "amenities": ["WiFi", "Pool", "Kids Club", "Playground", "Family Rooms", "Restaurant", "Bar", "Entertainment", "Game Room", "Babysitting"],
-                "description": f"Family-friendly resort in {location} with extensive facilities for children. Large pool, kids club, playground, family rooms, and entertainment. Perfect for families with children.",
-                "images": [
-                    "https://images.unsplash.com/photo-1571003123894-1f0594d2b5d9?w=800&h=600&fit=crop",
-                    "https://images.unsplash.com/photo-1564501049412-61c2a3083791?w=800&h=600&fit=crop"
-                ],
-                "url": f"https://booking.com/hotel/{query_hash}_family_1"
-            },
-            {
-                "hotel_id": f"{query_hash}_mid_1",
-                "name": f"Comfort Inn {location}",
-                "address": f"Main Avenue, {location}",
-                "city": location,
-                "country": self._get_country_from_location(location),
-                "latitude": base_lat + get_coord_offset(3, "lat"),
-                "longitude": base_lng + get_coord_offset(3, "lng"),
-                "price": 120.0,
-                "currency": "EUR",
-                "rating": 4.2,
-                "review_score": 8.3,
-                "review_count": 1850,
-                "amenities": ["WiFi", "Pool", "Restaurant", "Bar", "Parking", "Fitness Center"],
-                "description": f"Comfortable mid-range hotel in {location} with good value. Clean rooms, pool, restaurant, and convenient location. Great for travelers seeking comfort without luxury prices.",
-                "images": [
-                    "https://images.unsplash.com/photo-1590490360182-c33d57733427?w=800&h=600&fit=crop",
-                    "https://images.unsplash.com/photo-1566073771259-6a8506099945?w=800&h=600&fit=crop"
-                ],
-                "url": f"https://booking.com/hotel/{query_hash}_mid_1"
-            },
-            {
-                "hotel_id": f"{query_hash}_spa_1",
-                "name": f"Wellness Spa Hotel {location}",
-                "address": f"Relaxation Road, {location}",
-                "city": location,
-                "country": self._get_country_from_location(location),
-                "latitude": base_lat + get_coord_offset(2, "lat"),
-                "longitude": base_lng + get_coord_offset(2, "lng"),
-                "price": 200.0,
-                "currency": "EUR",
-                "rating": 4.6,
-                "review_score": 8.8,
-                "review_count": 1650,
-                "amenities": ["WiFi", "Spa", "Wellness Center", "Massage", "Sauna", "Steam Room", "Yoga Classes", "Restaurant", "Bar", "Pool"],
-                "description": f"Dedicated wellness and spa hotel in {location}. Extensive spa facilities, massage services, sauna, steam room, yoga classes, and healthy dining options. Perfect for relaxation and rejuvenation.",
-                "images": [
-                    "https://images.unsplash.com/photo-1571896349842-33c89424de2d?w=800&h=600&fit=crop",
-                    "https://images.unsplash.com/photo-1582719478250-c89cae4dc85b?w=800&h=600&fit=crop"
-                ],
-                "url": f"https://booking.com/hotel/{query_hash}_spa_1"
-            },
-            {
-                "hotel_id": f"{query_hash}_budget_1",
-                "name": f"Budget Inn {location}",
-                "address": f"Economy Street, {location}",
-                "city": location,
-                "country": self._get_country_from_location(location),
-                "latitude": base_lat + get_coord_offset(7, "lat"),
-                "longitude": base_lng + get_coord_offset(7, "lng"),
-                "price": 65.0,
-                "currency": "EUR",
-                "rating": 3.8,
-                "review_score": 7.6,
-                "review_count": 2800,
-                "amenities": ["WiFi", "Parking", "24-Hour Reception"],
-                "description": f"Affordable budget accommodation in {location}. Basic but clean rooms, free WiFi, parking available. Great value for money-conscious travelers.",
-                "images": [
-                    "https://images.unsplash.com/photo-1590490360182-c33d57733427?w=800&h=600&fit=crop",
-                    "https://images.unsplash.com/photo-1564501049412-61c2a3083791?w=800&h=600&fit=crop"
-                ],
-                "url": f"https://booking.com/hotel/{query_hash}_budget_1"
-            },
-            {
-                "hotel_id": f"{query_hash}_historic_1",
-                "name": f"Historic Grand Hotel {location}",
-                "address": f"Historic Square, {location}",
-                "city": location,
-                "country": self._get_country_from_location(location),
-                "latitude": base_lat + get_coord_offset(3, "lat"),
-                "longitude": base_lng + get_coord_offset(3, "lng"),
-                "price": 240.0,
-                "currency": "EUR",
-                "rating": 4.7,
-                "review_score": 9.0,
-                "review_count": 1950,
-                "amenities": ["WiFi", "Historic Building", "Restaurant", "Bar", "Concierge", "Room Service", "Fitness Center"],
-                "description": f"Beautifully restored historic hotel in the center of {location}. Combines classic architecture with modern amenities. Elegant rooms, fine dining, and rich history.",
-                "images": [
-                    "https://images.unsplash.com/photo-1566073771259-6a8506099945?w=800&h=600&fit=crop",
-                    "https://images.unsplash.com/photo-1551882547-ff40c63fe5fa?w=800&h=600&fit=crop"
-                ],
-                "url": f"https://booking.com/hotel/{query_hash}_historic_1"
-            },
-            {
-                "hotel_id": f"{query_hash}_eco_1",
-                "name": f"Eco-Friendly Hotel {location}",
-                "address": f"Green Boulevard, {location}",
-                "city": location,
-                "country": self._get_country_from_location(location),
-                "latitude": base_lat + get_coord_offset(2, "lat"),
-                "longitude": base_lng + get_coord_offset(2, "lng"),
-                "price": 140.0,
-                "currency": "EUR",
-                "rating": 4.4,
-                "review_score": 8.5,
-                "review_count": 1200,
-                "amenities": ["WiFi", "Eco-Friendly", "Organic Restaurant", "Bike Rental", "Solar Power", "Recycling", "Garden"],
-                "description": f"Environmentally conscious hotel in {location}. Sustainable practices, organic restaurant, bike rental, solar power. Perfect for eco-conscious travelers.",
-                "images": [
-                    "https://images.unsplash.com/photo-1564501049412-61c2a3083791?w=800&h=600&fit=crop",
-                    "https://images.unsplash.com/photo-1590490360182-c33d57733427?w=800&h=600&fit=crop"
-                ],
-                "url": f"https://booking.com/hotel/{query_hash}_eco_1"
-            }
-        ]
-        
-        return hotels
+        return _generate_mock_hotels(location, coords, country, query_hash)
     
     def _get_country_from_location(self, location: str) -> str:
         """Determine country from location name"""
-        location_lower = location.lower()
-        if any(c in location_lower for c in ["paris", "lyon", "nice", "marseille", "france"]):
-            return "France"
-        elif any(c in location_lower for c in ["rome", "milan", "venice", "florence", "italy", "naples"]):
-            return "Italy"
-        elif any(c in location_lower for c in ["london", "manchester", "edinburgh", "uk", "england"]):
-            return "United Kingdom"
-        elif any(c in location_lower for c in ["barcelona", "madrid", "seville", "spain"]):
-            return "Spain"
-        elif any(c in location_lower for c in ["berlin", "munich", "frankfurt", "germany"]):
-            return "Germany"
-        elif any(c in location_lower for c in ["amsterdam", "netherlands", "holland"]):
-            return "Netherlands"
-        elif any(c in location_lower for c in ["vienna", "austria"]):
-            return "Austria"
-        elif any(c in location_lower for c in ["prague", "czech"]):
-            return "Czech Republic"
-        else:
-            return "France"  # Default
+        return _country_for_location(location.lower())
     
     def _filter_mock_hotels(
         self, 
         hotels: List[Dict[str, Any]], 
         parameters: SearchParameters
     ) -> List[Dict[str, Any]]:
-        """Filter hotels based on search parameters"""
-        filtered = hotels.copy()
+        """
+        Filter hotels based on search parameters
         
-        # Filter by budget
-        if parameters.budget_max:
-            filtered = [h for h in filtered if h.get("price", 0) <= parameters.budget_max]
-        if parameters.budget_min:
-            filtered = [h for h in filtered if h.get("price", 0) >= parameters.budget_min]
+        Args:
+            hotels: Output of _generate_mock_hotel_database (one hotel per template, in order)
+            parameters: SearchParameters with budget bounds and preferences
+            
+        Returns:
+            Up to 12 hotels within budget, best preference matches first
+        """
+        price_order, sorted_prices, template_tags = _mock_catalog()
+        
+        # Filter by budget: binary search the price-sorted index, then restore catalog order
+        lo = np.searchsorted(sorted_prices, parameters.budget_min, "left") if parameters.budget_min else 0
+        hi = np.searchsorted(sorted_prices, parameters.budget_max, "right") if parameters.budget_max else None
+        indices = np.sort(price_order[lo:hi])
         
         # If preferences are specified, prioritize matching hotels
         if parameters.preferences:
-            pref_lower = [p.lower() for p in parameters.preferences]
+            # Scan preferences once for the tags they ask for
+            pref_bits = 0
+            for preference in parameters.preferences:
+                preference = preference.lower()
+                for keyword, tag in _PREF_KEYWORDS.items():
+                    if keyword in preference:
+                        pref_bits |= tag
             
-            # Score hotels based on preference matches
-            scored_hotels = []
-            for hotel in filtered:
-                score = 0
-                amenities_str = " ".join([a.lower() for a in hotel.get("amenities", [])])
-                name_desc = f"{hotel.get('name', '')} {hotel.get('description', '')}".lower()
-                
-                if any("luxury" in p or "premium" in p for p in pref_lower):
-                    if hotel.get("rating", 0) >= 4.5 or "luxury" in name_desc:
-                        score += 10
-                
-                if any("budget" in p or "cheap" in p or "affordable" in p for p in pref_lower):
-                    if hotel.get("price", 0) <= 100:
-                        score += 10
-                
-                if any("romantic" in p or "couple" in p for p in pref_lower):
-                    if "romantic" in name_desc or "boutique" in name_desc or "spa" in amenities_str:
-                        score += 10
-                
-                if any("family" in p or "kids" in p for p in pref_lower):
-                    if "family" in name_desc or "kids" in amenities_str:
-                        score += 10
-                
-                if any("business" in p or "corporate" in p for p in pref_lower):
-                    if "business" in name_desc or "business" in amenities_str:
-                        score += 10
-                
-                if any("beach" in p or "seaside" in p for p in pref_lower):
-                    if "beach" in name_desc or "beach" in amenities_str:
-                        score += 10
-                
-                if any("pool" in p for p in pref_lower):
-                    if "pool" in amenities_str:
-                        score += 10
-                
-                if any("spa" in p or "wellness" in p for p in pref_lower):
-                    if "spa" in amenities_str or "wellness" in amenities_str:
-                        score += 10
-                
-                scored_hotels.append((score, hotel))
+            # Score hotels by how many requested tags they carry
+            scores = _POPCOUNT[template_tags[indices] & pref_bits]
             
-            # Sort by score and return top matches
-            scored_hotels.sort(key=lambda x: x[0], reverse=True)
-            filtered = [h for _, h in scored_hotels if _ > 0] or [h for _, h in scored_hotels]
+            # Sort by score (stable, so catalog order breaks ties) and keep matches if any
+            order = np.argsort(-scores, kind="stable")
+            indices, scores = indices[order], scores[order]
+            if scores.size and scores[0] > 0:
+                indices = indices[scores > 0]
         
         # Return 8-12 hotels (simulate realistic API response)
-        return filtered[:12] if len(filtered) > 12 else filtered
-
+        return [hotels[i] for i in indices[:12]]
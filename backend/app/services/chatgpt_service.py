@@ -1,132 +1,735 @@
 """
 ChatGPT service for extracting search parameters and filtering hotel results
 """
+import asyncio
 import json
 import logging
-from typing import Dict, List, Any, Optional
-from openai import OpenAI
+import re
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple
+import httpx
+import numpy as np
+import orjson
+from openai import AsyncOpenAI
 from openai import RateLimitError, APIError
+from pydantic import ValidationError
 from app.config import settings
 from app.schemas.recommendation import (
     ChatGPTParameterExtractionResponse
 )
+from app.utils.cache import ResponseCache
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1)
+def get_openai_client() -> AsyncOpenAI:
+    """
+    AsyncOpenAI client over one keep-alive connection pool, shared by all OpenAI calls.
+    Created on first use, and again after close_openai_client (e.g. when the app restarts)
+    """
+    return AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        http_client=httpx.AsyncClient(limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+    )
+
+
+async def close_openai_client() -> None:
+    """Close the shared OpenAI client's connections on shutdown"""
+    if get_openai_client.cache_info().currsize:
+        await get_openai_client().close()
+    get_openai_client.cache_clear()
+
+
+# Bounds in-flight OpenAI calls per worker, to stay under the account's rate limits
+openai_semaphore = asyncio.Semaphore(settings.openai_max_concurrency)
+
+# Exact-match caches of ChatGPT results (fallback results are never stored)
+_extraction_cache = ResponseCache("gpt:extract:", ttl=settings.chatgpt_cache_ttl)
+_filter_cache = ResponseCache("gpt:filter:", ttl=settings.chatgpt_cache_ttl)
+_criteria_cache = ResponseCache("gpt:criteria:", ttl=settings.chatgpt_cache_ttl)
+
+# Strict JSON schema for parameter extraction; the API enforces it, so prompts don't spell it out.
+# Models without structured outputs (gpt-4, gpt-3.5-turbo, ...) reject json_schema response
+# formats, so they get JSON mode with the fields listed in the system prompt instead
+_STRUCTURED_OUTPUT_MODEL_PREFIXES = ("gpt-4o", "gpt-4.1")
+_NO_STRUCTURED_OUTPUT_MODELS = frozenset({"gpt-4o-2024-05-13"})
+_NULLABLE_STRING = {"type": ["string", "null"]}
+_NULLABLE_NUMBER = {"type": ["number", "null"]}
+_EXTRACTION_PROPERTIES = {
+    "location": _NULLABLE_STRING,
+    "check_in": _NULLABLE_STRING,
+    "check_out": _NULLABLE_STRING,
+    "budget_min": _NULLABLE_NUMBER,
+    "budget_max": _NULLABLE_NUMBER,
+    "adults": {"type": "integer"},
+    "children": {"type": "integer"},
+    "rooms": {"type": "integer"},
+    "preferences": {"type": ["array", "null"], "items": {"type": "string"}},
+}
+_EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": _EXTRACTION_PROPERTIES,
+    "required": list(_EXTRACTION_PROPERTIES),
+    "additionalProperties": False,
+}
+_EXTRACTION_BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"index": {"type": "integer"}, **_EXTRACTION_PROPERTIES},
+                "required": ["index", *_EXTRACTION_PROPERTIES],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["results"],
+    "additionalProperties": False,
+}
+# Static instructions lead each conversation and requests come last, so every call
+# shares the longest possible prompt prefix for OpenAI's automatic prompt caching
+_EXTRACTION_SYSTEM_PROMPT = (
+    "Extract hotel search parameters. Dates as YYYY-MM-DD, relative dates calculated. "
+    "Budget in EUR. Default 1 adult, 0 children, 1 room. Null if unknown."
+)
+_EXTRACTION_BATCH_PROMPT = "Requests are numbered; return one result per request with its index."
+_EXTRACTION_JSON_SHAPE = (
+    '{"location": string|null, "check_in": "YYYY-MM-DD"|null, "check_out": "YYYY-MM-DD"|null, '
+    '"budget_min": number|null, "budget_max": number|null, "adults": int, "children": int, "rooms": int, '
+    '"preferences": [string]|null}'
+)
+_EXTRACTION_JSON_FIELDS = f"Return JSON: {_EXTRACTION_JSON_SHAPE}"
+_EXTRACTION_BATCH_JSON_FIELDS = f'Return JSON: {{"results": [{{"index": int, ...fields}}]}} with fields {_EXTRACTION_JSON_SHAPE}'
+_RANKING_CRITERIA_SYSTEM_PROMPT = (
+    "List what matters most when ranking hotels for the user's request. "
+    'Return JSON only (max 5, most important first): {"criteria": ["short criterion", ...]}'
+)
+_FILTER_SYSTEM_PROMPT = (
+    "Filter the hotels for the user's request, using any ranking priorities given. "
+    'Return JSON with hotel IDs that match (ordered by relevance): {"matched_ids": ["id1", "id2", ...]}'
+)
+# With settings.chatgpt_rule_first, date-free demands shorter than this are answered by the rule-based
+# extractor alone when it finds at least _RULE_FIRST_MIN_FIELDS of location, budget and preferences
+_RULE_FIRST_MAX_DEMAND_LENGTH = 60
+_RULE_FIRST_MIN_FIELDS = 2
+# Most hotels summarized in one filter prompt, keeping its token count bounded
+_FILTER_MAX_HOTELS = 50
+
+# Rule-based fallback vocabulary, compiled once (used when ChatGPT is unavailable).
+# Locations are checked in order and the first one found in the demand wins.
+_FALLBACK_LOCATIONS = (
+    "italy", "france", "spain", "paris", "rome", "london", "berlin", "amsterdam",
+    "vienna", "prague", "barcelona", "madrid", "milan", "venice", "florence",
+    "lake como", "tuscany", "santorini", "mykonos", "bali", "thailand"
+)
+# Patterns like "under 200€", "below 200", "less than 200"
+_EXTRACT_BUDGET_PATTERNS = tuple(re.compile(p) for p in (
+    r"under\s+(\d+)",
+    r"below\s+(\d+)",
+    r"less\s+than\s+(\d+)",
+    r"up\s+to\s+(\d+)",
+    r"max\s+(\d+)",
+    r"maximum\s+(\d+)",
+    r"(\d+)\s*€",
+    r"(\d+)\s*eur",
+    r"(\d+)\s*euro"
+))
+_EXTRACT_PREFERENCE_KEYWORDS = {
+    "romantic": frozenset({"romantic", "romance", "couple", "honeymoon"}),
+    "family": frozenset({"family", "family-friendly", "kids", "children"}),
+    "luxury": frozenset({"luxury", "luxurious", "5-star", "five star"}),
+    "beach": frozenset({"beach", "seaside", "coastal", "ocean"}),
+    "mountain": frozenset({"mountain", "alpine", "ski"}),
+    "city": frozenset({"city", "urban", "downtown"}),
+}
+_ADULTS_PATTERN = re.compile(r"(\d+)\s+adult")
+# Patterns without a group ("budget", "cheap", "affordable") imply a low budget
+_FILTER_BUDGET_PATTERNS = tuple(re.compile(p) for p in (
+    r"under\s+(\d+)",
+    r"below\s+(\d+)",
+    r"less\s+than\s+(\d+)",
+    r"up\s+to\s+(\d+)",
+    r"(\d+)\s*€",
+    r"(\d+)\s*eur",
+    r"budget",
+    r"cheap",
+    r"affordable"
+))
+_FILTER_PREFERENCE_KEYWORDS = {
+    "luxury": frozenset({"luxury", "premium", "5-star", "five star"}),
+    "budget": frozenset({"budget", "cheap", "affordable", "economy"}),
+    "romantic": frozenset({"romantic", "honeymoon", "couple"}),
+    "family": frozenset({"family", "kids", "children", "family-friendly"}),
+    "business": frozenset({"business", "corporate", "conference"}),
+    "beach": frozenset({"beach", "seaside", "ocean", "coast"}),
+    "pool": frozenset({"pool", "swimming"}),
+    "spa": frozenset({"spa", "wellness", "massage"}),
+}
+
+
+def _contains_any(text: str, keywords: frozenset) -> bool:
+    """
+    Whether any keyword occurs in text (plain substring tests, cheaper than any() over a generator).
+    With a few short keywords per category this also beats a single multi-keyword scan: a
+    combined alternation regex tries a match at every character and measured about 3x slower
+    """
+    for kw in keywords:
+        if kw in text:
+            return True
+    return False
+
+
+def _match_categories(categories: Dict[str, frozenset], text: str) -> List[str]:
+    """Categories with a keyword occurring in text, in declaration order"""
+    return [category for category, keywords in categories.items() if _contains_any(text, keywords)]
+
+
+# Hotel keywords scored by the fallback filter (substring matches)
+_LUXURY_NAME_KEYWORDS = frozenset({"luxury", "resort", "grand"})
+_BUDGET_NAME_KEYWORDS = frozenset({"budget", "inn", "hostel"})
+_ROMANTIC_KEYWORDS = frozenset({"spa", "romantic", "boutique"})
+_FAMILY_KEYWORDS = frozenset({"pool", "kids", "family", "playground"})
+_BEACH_KEYWORDS = frozenset({"beach", "ocean", "seaside", "coast"})
+_AMENITY_KEYWORDS = _ROMANTIC_KEYWORDS | _FAMILY_KEYWORDS | _BEACH_KEYWORDS
+
+
+@lru_cache(maxsize=1024)
+def _amenity_keywords(amenity: str) -> frozenset:
+    """Hotel keywords in one amenity name (the amenity vocabulary is small and shared across hotels)"""
+    amenity = amenity.lower()
+    return frozenset(kw for kw in _AMENITY_KEYWORDS if kw in amenity)
+
+
+_JSON_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"\s*")
+
+
+@lru_cache(maxsize=1024)
+def _parse_extraction_intent(user_lower: str) -> Tuple[Optional[str], Optional[float], Tuple[str, ...], int]:
+    """
+    Rule-based intent for parameter extraction, memoized per lowercased demand
+    
+    Returns:
+        (location, budget_max, preferences, adults)
+    """
+    # Extract location (first known location mentioned)
+    location = next((loc.title() for loc in _FALLBACK_LOCATIONS if loc in user_lower), None)
+    
+    # Extract budget
+    budget_max = None
+    for pattern in _EXTRACT_BUDGET_PATTERNS:
+        match = pattern.search(user_lower)
+        if match:
+            budget_max = float(match.group(1))
+            break
+    
+    # Extract number of adults (basic)
+    adults_match = _ADULTS_PATTERN.search(user_lower)
+    adults = int(adults_match.group(1)) if adults_match else 1
+    
+    return location, budget_max, tuple(_match_categories(_EXTRACT_PREFERENCE_KEYWORDS, user_lower)), adults
+
+
+@lru_cache(maxsize=1024)
+def _parse_filter_intent(user_lower: str) -> Tuple[Optional[float], Tuple[str, ...]]:
+    """
+    Rule-based intent for hotel filtering, memoized per lowercased demand
+    
+    Returns:
+        (budget_max, detected preferences)
+    """
+    budget_max = None
+    for pattern in _FILTER_BUDGET_PATTERNS:
+        match = pattern.search(user_lower)
+        if match:
+            if match.groups():
+                budget_max = float(match.group(1))
+            else:
+                # For "budget", "cheap", "affordable" - set a low budget
+                budget_max = 100.0
+            break
+    
+    return budget_max, tuple(_match_categories(_FILTER_PREFERENCE_KEYWORDS, user_lower))
+
+
+# Literal details that embeddings of otherwise identical demands barely distinguish
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+_DATE_TERMS = re.compile(
+    r"\b(?:today|tonight|tomorrow|weekends?|weeks?|months?|years?|nights?|days?"
+    r"|monday|tuesday|wednesday|thursday|friday|saturday|sunday"
+    r"|jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?"
+    r"|christmas|easter|spring|summer|autumn|fall|winter)\b"
+)
+# Dates written with digits: 12/05, 2025-06-01, 5th
+_NUMERIC_DATE = re.compile(r"\d{1,4}[/.-]\d{1,2}\b|\b\d{1,2}(?:st|nd|rd|th)\b")
+
+
+def _mentions_date(user_lower: str) -> bool:
+    """Whether a lowercased demand mentions a date or time (possibly relative to today)"""
+    return bool(_DATE_TERMS.search(user_lower) or _NUMERIC_DATE.search(user_lower))
+
+
+@lru_cache(maxsize=1024)
+def demand_fingerprint(user_demand: str) -> str:
+    """
+    Literal facts of a demand: its numbers, date terms, rule-based location, preferences
+    and budget. Near-identical embeddings only mean the same request when these agree
+    (e.g. "Paris under 100€" vs "Paris under 300€"), so semantic caches scope by it
+    """
+    user_lower = user_demand.lower()
+    location, _, extraction_preferences, _ = _parse_extraction_intent(user_lower)
+    budget_max, filter_preferences = _parse_filter_intent(user_lower)
+    return repr((
+        sorted(_NUMBER.findall(user_lower)),
+        sorted(set(_DATE_TERMS.findall(user_lower))),
+        location,
+        extraction_preferences,
+        filter_preferences,
+        budget_max,
+    ))
+
+
+def normalize_demand(user_demand: str) -> str:
+    """Lowercase and collapse whitespace, so trivially different phrasings share cache entries"""
+    return " ".join(user_demand.lower().split())
+
+
+def parse_partial_json_object(text: str) -> Dict[str, Any]:
+    """
+    Parse the completed top-level fields of a JSON object that is still being streamed,
+    e.g. '{"location": "Rome", "check_in": nu' -> {"location": "Rome"}
+    """
+    fields = {}
+    pos = text.find("{") + 1
+    if not pos:
+        return fields
+    
+    while True:
+        try:
+            pos = _WHITESPACE.match(text, pos).end()
+            key, pos = _JSON_DECODER.raw_decode(text, pos)
+            pos = _WHITESPACE.match(text, pos).end()
+            if not isinstance(key, str) or text[pos:pos + 1] != ":":
+                return fields
+            pos = _WHITESPACE.match(text, pos + 1).end()
+            value, pos = _JSON_DECODER.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            return fields
+        
+        # A value is only complete once a delimiter follows it (e.g. 12 may still become 120)
+        pos = _WHITESPACE.match(text, pos).end()
+        delimiter = text[pos:pos + 1]
+        if delimiter not in (",", "}"):
+            return fields
+        fields[key] = value
+        if delimiter == "}":
+            return fields
+        pos += 1
+
+
 class ChatGPTService:
     """Service for interacting with ChatGPT API"""
     
     def __init__(self):
         self.api_key = settings.openai_api_key
         self.model = settings.openai_model
-        if self.api_key:
-            self.client = OpenAI(api_key=self.api_key)
-        else:
-            self.client = None
+        if not self.api_key:
             logger.warning("OpenAI API key is not configured. ChatGPT features will not work.")
     
-    def extract_search_parameters(self, user_demand: str) -> ChatGPTParameterExtractionResponse:
+    @property
+    def client(self) -> Optional[AsyncOpenAI]:
+        """The shared OpenAI client, or None when no API key is configured"""
+        return get_openai_client() if self.api_key else None
+    
+    async def aextract_search_parameters(
+        self, 
+        user_demand: str, 
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+        check_cache: bool = True
+    ) -> ChatGPTParameterExtractionResponse:
         """
-        Extract search parameters from user's natural language demand
+        Extract search parameters from user's natural language demand.
+        Uses AsyncOpenAI, so the event loop is free while waiting on the completion
         
         Args:
             user_demand: User's natural language request
+            on_partial: Optional callback; when given, the completion is streamed and
+                the callback receives the fields parsed so far each time a new one completes
+            check_cache: False when the caller already missed acached_search_parameters
             
         Returns:
             ChatGPTParameterExtractionResponse with extracted parameters
         """
-        # Optimized prompt - shorter and more concise
-        prompt = f"""Extract hotel search parameters from: "{user_demand}"
-
-Return JSON only:
-{{
-  "location": "city/country name or null",
-  "check_in": "YYYY-MM-DD or null",
-  "check_out": "YYYY-MM-DD or null",
-  "budget_min": number or null,
-  "budget_max": number or null,
-  "adults": number (default 1),
-  "children": number (default 0),
-  "rooms": number (default 1),
-  "preferences": ["keyword1", "keyword2"] or null
-}}
-
-Notes: Calculate relative dates. Budget defaults to EUR. Return null if unknown."""
-
+        extracted, _ = await self.aextract_search_parameters_cacheable(user_demand, on_partial, check_cache)
+        return extracted
+    
+    async def aextract_search_parameters_cacheable(
+        self, 
+        user_demand: str, 
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+        check_cache: bool = True
+    ) -> Tuple[ChatGPTParameterExtractionResponse, bool]:
+        """
+        aextract_search_parameters, also reporting whether the result may be cached
+        
+        Returns:
+            (extracted parameters, cacheable); cacheable is False for rule-based fallbacks
+            and for demands mentioning dates, which may resolve differently tomorrow
+        """
+        cacheable = not _mentions_date(user_demand.lower())
+        if check_cache:
+            cached = await self.acached_search_parameters(user_demand)
+            if cached is not None:
+                return cached, True
+        
         try:
-            response = self.client.chat.completions.create(
+            if on_partial is None:
+                response = await self._complete(**self._extraction_request(user_demand))
+                content = response.choices[0].message.content
+            else:
+                content = await self._astream_content(self._extraction_request(user_demand), on_partial)
+            extracted = self._parse_extraction_content(content)
+            if cacheable:
+                await _extraction_cache.set(self._extraction_cache_key(user_demand), extracted.model_dump_json().encode())
+            return extracted, cacheable
+        except (RateLimitError, APIError) as e:
+            if self._is_quota_error(e):
+                logger.warning("ChatGPT quota/rate limit exceeded, using fallback parameter extraction: %s", e)
+                return self._fallback_extract_parameters(user_demand), False
+            logger.error("ChatGPT API error: %s", e)
+            raise
+        except Exception as e:
+            logger.error("Unexpected error calling ChatGPT API: %s", e)
+            raise
+    
+    async def acached_search_parameters(self, user_demand: str) -> Optional[ChatGPTParameterExtractionResponse]:
+        """
+        Exact-match cache lookup for aextract_search_parameters (local memory, then Redis)
+        
+        Args:
+            user_demand: User's natural language request
+            
+        Returns:
+            Cached extraction for the normalized demand, or None on a miss
+            (always for demands mentioning dates, which are never cached)
+        """
+        if _mentions_date(user_demand.lower()):
+            return None
+        cached = await _extraction_cache.get(self._extraction_cache_key(user_demand))
+        if cached is None:
+            return None
+        logger.info("ChatGPT parameter extraction cache hit")
+        return ChatGPTParameterExtractionResponse.model_validate_json(cached)
+    
+    def _extraction_cache_key(self, user_demand: str) -> str:
+        """Exact-match cache key for an extraction: model and normalized demand"""
+        return f"{self.model}\n{normalize_demand(user_demand)}"
+    
+    def rule_confident_parameters(self, user_demand: str) -> Optional[ChatGPTParameterExtractionResponse]:
+        """
+        Rule-based extraction for short demands it covers well enough to skip ChatGPT.
+        The rules never read dates, so demands mentioning a date or time are not covered
+        
+        Args:
+            user_demand: User's natural language request
+            
+        Returns:
+            Extracted parameters, or None when ChatGPT is needed
+        """
+        if len(user_demand) >= _RULE_FIRST_MAX_DEMAND_LENGTH:
+            return None
+        if _mentions_date(user_demand.lower()):
+            return None
+        extracted = self._fallback_extract_parameters(user_demand)
+        found = sum(bool(field) for field in (extracted.location, extracted.budget_max, extracted.preferences))
+        return extracted if found >= _RULE_FIRST_MIN_FIELDS else None
+    
+    async def _astream_content(
+        self, 
+        request: Dict[str, Any], 
+        on_partial: Callable[[Dict[str, Any]], None]
+    ) -> str:
+        """Stream a JSON completion, reporting its fields as they complete, and return the full content"""
+        content = ""
+        reported_count = 0
+        # Hold the concurrency slot until the stream is fully consumed
+        async with openai_semaphore:
+            stream = await self.client.chat.completions.create(**request, stream=True)
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                content += chunk.choices[0].delta.content
+                fields = parse_partial_json_object(content)
+                if len(fields) > reported_count:
+                    reported_count = len(fields)
+                    on_partial(fields)
+        return content
+    
+    async def _complete(self, **request: Any) -> Any:
+        """Create a chat completion, waiting for a free openai_semaphore slot first"""
+        async with openai_semaphore:
+            return await self.client.chat.completions.create(**request)
+    
+    def _extraction_request(self, user_demand: str) -> Dict[str, Any]:
+        """Build the chat completion arguments for parameter extraction"""
+        response_format, system_prompt = self._json_output(
+            "search_parameters", _EXTRACTION_SCHEMA, _EXTRACTION_SYSTEM_PROMPT, _EXTRACTION_JSON_FIELDS
+        )
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_demand}
+            ],
+            "temperature": 0.3,
+            "response_format": response_format,
+            "max_tokens": 200  # Limit response length
+        }
+    
+    def _json_output(
+        self, 
+        name: str, 
+        schema: Dict[str, Any], 
+        system_prompt: str, 
+        json_fields: str
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Response format and system prompt for a JSON completion: a strict schema when the
+        model supports structured outputs, else JSON mode with the fields in the prompt
+        
+        Returns:
+            (response_format, system_prompt)
+        """
+        if self.model.startswith(_STRUCTURED_OUTPUT_MODEL_PREFIXES) and self.model not in _NO_STRUCTURED_OUTPUT_MODELS:
+            return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}, system_prompt
+        return {"type": "json_object"}, f"{system_prompt} {json_fields}"
+    
+    async def aextract_search_parameters_batch(
+        self, 
+        user_demands: List[str]
+    ) -> List[ChatGPTParameterExtractionResponse]:
+        """
+        Extract search parameters for several demands, packing up to
+        settings.chatgpt_extraction_batch_size demands into each completion
+        
+        Args:
+            user_demands: User's natural language requests
+            
+        Returns:
+            ChatGPTParameterExtractionResponse per demand, in input order
+        """
+        if not self.client:
+            return [self._fallback_extract_parameters(demand) for demand in user_demands]
+        
+        size = settings.chatgpt_extraction_batch_size
+        batches = await asyncio.gather(*[
+            self._aextract_batch(user_demands[i:i + size]) for i in range(0, len(user_demands), size)
+        ])
+        return [extracted for batch in batches for extracted in batch]
+    
+    async def _aextract_batch(self, user_demands: List[str]) -> List[ChatGPTParameterExtractionResponse]:
+        """Extract parameters for one batch of demands with a single completion"""
+        inputs = "\n".join(f"{i}: {demand}" for i, demand in enumerate(user_demands))
+        response_format, system_prompt = self._json_output(
+            "search_parameters_batch",
+            _EXTRACTION_BATCH_SCHEMA,
+            f"{_EXTRACTION_SYSTEM_PROMPT} {_EXTRACTION_BATCH_PROMPT}",
+            _EXTRACTION_BATCH_JSON_FIELDS
+        )
+        try:
+            response = await self._complete(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "Extract hotel search parameters. Return JSON only."},
-                    {"role": "user", "content": prompt}
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": inputs}
                 ],
                 temperature=0.3,
-                response_format={"type": "json_object"},
-                max_tokens=200  # Limit response length
+                response_format=response_format,
+                max_tokens=150 * len(user_demands)
             )
-            
-            content = response.choices[0].message.content
-            logger.info(f"ChatGPT parameter extraction response: {content}")
-            
-            # Parse JSON response
-            try:
-                params_dict = json.loads(content)
-                return ChatGPTParameterExtractionResponse(**params_dict)
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse ChatGPT JSON response: {e}")
-                logger.error(f"Response content: {content}")
-                # Fallback: try to extract JSON from markdown code blocks
-                if "```json" in content:
-                    json_start = content.find("```json") + 7
-                    json_end = content.find("```", json_start)
-                    content = content[json_start:json_end].strip()
-                    params_dict = json.loads(content)
-                    return ChatGPTParameterExtractionResponse(**params_dict)
-                raise
-            
+            results = orjson.loads(response.choices[0].message.content).get("results") or []
+        except (json.JSONDecodeError, AttributeError) as e:
+            # Truncated or malformed output: every demand in the batch gets the rule-based extraction
+            logger.error("Failed to parse ChatGPT batch extraction response: %s", e)
+            results = []
         except (RateLimitError, APIError) as e:
-            error_str = str(e)
-            # Check if it's a quota/rate limit error
-            if "insufficient_quota" in error_str.lower() or "429" in error_str or "rate_limit" in error_str.lower() or isinstance(e, RateLimitError):
-                logger.warning(f"ChatGPT quota/rate limit exceeded, using fallback parameter extraction: {e}")
-                # Fallback to simple rule-based extraction
-                return self._fallback_extract_parameters(user_demand)
-            logger.error(f"ChatGPT API error: {e}")
+            if self._is_quota_error(e):
+                logger.warning("ChatGPT quota/rate limit exceeded, using fallback parameter extraction: %s", e)
+                return [self._fallback_extract_parameters(demand) for demand in user_demands]
+            logger.error("ChatGPT API error: %s", e)
             raise
+        
+        by_index = {r.get("index"): r for r in results if isinstance(r, dict)}
+        extracted = []
+        for i, demand in enumerate(user_demands):
+            # Demands the model skipped or mangled get the rule-based extraction
+            try:
+                extracted.append(ChatGPTParameterExtractionResponse(**by_index[i]))
+            except (KeyError, ValidationError):
+                extracted.append(self._fallback_extract_parameters(demand))
+        return extracted
+    
+    def _parse_extraction_content(self, content: str) -> ChatGPTParameterExtractionResponse:
+        """Parse parameter extraction completion content into the response schema"""
+        logger.info("ChatGPT parameter extraction response: %s", content)
+        
+        # Both response formats (schema or JSON mode) return bare JSON, never markdown
+        return ChatGPTParameterExtractionResponse(**orjson.loads(content))
+    
+    @staticmethod
+    def _is_quota_error(error: Exception) -> bool:
+        """Check if an OpenAI error is a quota/rate limit error"""
+        error_str = str(error)
+        return (
+            isinstance(error, RateLimitError)
+            or "insufficient_quota" in error_str.lower()
+            or "429" in error_str
+            or "rate_limit" in error_str.lower()
+        )
+    
+    async def aextract_ranking_criteria(self, user_demand: str) -> List[str]:
+        """
+        Ask ChatGPT which criteria matter most when ranking hotels for the demand.
+        Only depends on the demand, so it can run concurrently with parameter extraction.
+        
+        Args:
+            user_demand: User's natural language request
+            
+        Returns:
+            Short criteria, most important first (empty if unavailable)
+        """
+        if not self.client:
+            return []
+        
+        # Cached per normalized demand, so identical demands also share filter cache entries
+        cache_key = f"{self.model}\n{normalize_demand(user_demand)}"
+        cached = await _criteria_cache.get(cache_key)
+        if cached is not None:
+            logger.info("ChatGPT ranking criteria cache hit")
+            return orjson.loads(cached)
+        
+        try:
+            response = await self._complete(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": _RANKING_CRITERIA_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_demand}
+                ],
+                temperature=0.3,
+                response_format={"type": "json_object"},
+                max_tokens=60  # A handful of short phrases
+            )
+            criteria = orjson.loads(response.choices[0].message.content).get("criteria") or []
+            criteria = [str(c) for c in criteria[:5]]
         except Exception as e:
-            logger.error(f"Unexpected error calling ChatGPT API: {e}")
-            raise
+            # Criteria are only a hint for filtering - never fail the request over them
+            logger.warning("Could not extract ranking criteria: %s", e)
+            return []
+        
+        await _criteria_cache.set(cache_key, orjson.dumps(criteria))
+        return criteria
     
-    def filter_hotels_by_demand(
+    async def afilter_hotels_by_demand(
         self, 
         user_demand: str, 
-        hotels: List[Dict[str, Any]]
+        hotels: List[Dict[str, Any]],
+        ranking_criteria: Optional[List[str]] = None
     ) -> List[str]:
         """
-        Filter hotels based on user demand using ChatGPT - OPTIMIZED VERSION
+        Filter hotels based on user demand using ChatGPT.
         Returns only hotel IDs to minimize token usage
         
         Args:
             user_demand: Original user demand
             hotels: List of hotel data from Booking.com API
+            ranking_criteria: Optional criteria from aextract_ranking_criteria to rank by
             
         Returns:
             List of hotel IDs (strings) that match, ordered by relevance
         """
+        matched_ids, _ = await self.afilter_hotels_by_demand_cacheable(user_demand, hotels, ranking_criteria)
+        return matched_ids
+    
+    async def afilter_hotels_by_demand_cacheable(
+        self, 
+        user_demand: str, 
+        hotels: List[Dict[str, Any]],
+        ranking_criteria: Optional[List[str]] = None
+    ) -> Tuple[List[str], bool]:
+        """
+        afilter_hotels_by_demand, also reporting whether the result may be cached
+        
+        Returns:
+            (matched hotel IDs, cacheable); cacheable is False for rule-based fallbacks
+        """
         if not hotels:
-            return []
+            return [], True
         
-        # Prepare MINIMAL hotel data - only essential fields with IDs
-        hotels_summary = []
+        if not self.client:
+            logger.warning("OpenAI API key is not configured. Using fallback filtering.")
+            return await self._afallback_filter_hotels(user_demand, hotels), False
+        
+        # Keyed on the hotel ID set, so the entry survives reordered inputs
+        hotel_ids = sorted(str(hotel.get("hotel_id", "")) for hotel in hotels)
+        cache_key = "\n".join((
+            self.model, normalize_demand(user_demand), ",".join(hotel_ids), "|".join(ranking_criteria or ())
+        ))
+        cached = await _filter_cache.get(cache_key)
+        if cached is not None:
+            logger.info("ChatGPT hotel filtering cache hit")
+            return orjson.loads(cached), True
+        
+        # Large lists are filtered in concurrent shards, keeping each prompt and ID list small
+        shard_size = settings.chatgpt_filter_shard_size
+        try:
+            if len(hotels) <= shard_size:
+                matched_ids = await self._afilter_shard(user_demand, hotels, ranking_criteria)
+            else:
+                rankings = await asyncio.gather(*[
+                    self._afilter_shard(user_demand, hotels[i:i + shard_size], ranking_criteria)
+                    for i in range(0, len(hotels), shard_size)
+                ])
+                matched_ids = self._merge_rankings(rankings)
+        except Exception as e:
+            return await self._ahandle_filter_error(e, user_demand, hotels), False
+        
+        await _filter_cache.set(cache_key, orjson.dumps(matched_ids))
+        return matched_ids, True
+    
+    async def _afilter_shard(
+        self, 
+        user_demand: str, 
+        hotels: List[Dict[str, Any]],
+        ranking_criteria: Optional[List[str]]
+    ) -> List[str]:
+        """Filter one shard of hotels with a single completion"""
+        response = await self._complete(**self._filter_request(user_demand, hotels, ranking_criteria))
+        return self._parse_filter_response(response)
+    
+    @staticmethod
+    def _merge_rankings(rankings: List[List[str]]) -> List[str]:
+        """Merge per-shard rankings by reciprocal rank: each ID scores 1/(rank+1) in every ranking it appears in"""
+        scores: Dict[str, float] = {}
+        for ranking in rankings:
+            for rank, hotel_id in enumerate(ranking):
+                scores[hotel_id] = scores.get(hotel_id, 0.0) + 1.0 / (rank + 1)
+        return sorted(scores, key=scores.__getitem__, reverse=True)
+    
+    @staticmethod
+    def _iter_hotel_summaries(hotels: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield the minimal prompt summary of each hotel that has an ID"""
         for hotel in hotels:
             hotel_id = str(hotel.get("hotel_id", ""))
             if not hotel_id:
                 continue  # Skip hotels without ID
             
-            # Include amenities for better filtering
-            amenities = hotel.get("amenities", [])
-            amenities_str = ", ".join(amenities[:5]) if amenities else ""  # Limit to first 5
+            # Include amenities for better filtering, limited to the first 5
+            amenities_str = ", ".join(islice(hotel.get("amenities") or (), 5))
             
             # Minimal data - only what's needed for matching
             hotel_summary = {
@@ -137,281 +740,209 @@ Notes: Calculate relative dates. Budget defaults to EUR. Return null if unknown.
                 "rating": hotel.get("rating") or hotel.get("review_score"),
                 "amenities": amenities_str[:100]  # Truncate amenities
             }
-            hotels_summary.append(hotel_summary)
+            # Drop empty fields - they only cost prompt tokens
+            yield {k: v for k, v in hotel_summary.items() if v not in (None, "")}
+    
+    def _filter_request(
+        self, 
+        user_demand: str, 
+        hotels: List[Dict[str, Any]],
+        ranking_criteria: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Build the chat completion arguments for hotel filtering"""
+        # Prepare MINIMAL hotel data for at most _FILTER_MAX_HOTELS hotels with IDs
+        hotels_summary = list(islice(self._iter_hotel_summaries(hotels), _FILTER_MAX_HOTELS))
         
-        logger.info(f"Filtering {len(hotels_summary)} hotels for user demand: '{user_demand}'")
-        logger.debug(f"Hotels summary: {json.dumps(hotels_summary, ensure_ascii=False)[:500]}...")
+        # orjson output is compact and unescaped: whitespace and \u escapes are pure prompt-token overhead
+        hotels_json = orjson.dumps(hotels_summary).decode()
         
-        # Optimized prompt - much shorter
-        prompt = f"""User request: "{user_demand}"
-
-Hotels:
-{json.dumps(hotels_summary, ensure_ascii=False)}
-
-Return JSON with hotel IDs that match (ordered by relevance):
-{{"matched_ids": ["id1", "id2", ...]}}"""
+        logger.info("Filtering %d hotels for user demand: '%s'", len(hotels_summary), user_demand)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Hotels summary: %s...", hotels_json[:500])
+        
+        # Hotels before the request: the same search results are filtered for many demands
+        prompt = f'Hotels:\n{hotels_json}\n\nUser request: "{user_demand}"'
+        if ranking_criteria:
+            prompt += f'\nRanking priorities: {", ".join(ranking_criteria)}'
 
-        if not self.client:
-            logger.warning("OpenAI API key is not configured. Using fallback filtering.")
-            return self._fallback_filter_hotels(user_demand, hotels)
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": _FILTER_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.3,
+            "response_format": {"type": "json_object"},
+            "max_tokens": 500  # Limit response - only IDs needed
+        }
+    
+    @staticmethod
+    def _parse_filter_response(response: Any) -> List[str]:
+        """
+        Parse a hotel filtering completion into a list of matched hotel IDs.
+        Raises on truncated or malformed content, so the caller falls back without caching
+        """
+        content = response.choices[0].message.content
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("ChatGPT hotel filtering response (truncated): %s...", content[:200])
         
+        # Parse JSON response
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Filter hotels. Return JSON with matched_ids array only."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"},
-                max_tokens=500  # Limit response - only IDs needed
-            )
+            if "```json" in content:
+                json_start = content.find("```json") + 7
+                json_end = content.find("```", json_start)
+                content = content[json_start:json_end].strip()
             
-            content = response.choices[0].message.content
-            logger.info(f"ChatGPT hotel filtering response (truncated): {content[:200]}...")
-            logger.info(f"Full ChatGPT response: {content}")
+            filter_result = orjson.loads(content)
+            matched_ids = filter_result.get("matched_ids", [])
             
-            # Parse JSON response
-            try:
-                if "```json" in content:
-                    json_start = content.find("```json") + 7
-                    json_end = content.find("```", json_start)
-                    content = content[json_start:json_end].strip()
-                
-                filter_result = json.loads(content)
-                matched_ids = filter_result.get("matched_ids", [])
-                
-                logger.info(f"ChatGPT successfully matched {len(matched_ids)} hotel IDs: {matched_ids}")
-                return matched_ids
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse ChatGPT filtering response: {e}")
-                logger.error(f"Response content: {content}")
-                logger.warning("Using fallback filtering due to JSON parse error")
-                # Fallback to rule-based filtering
-                return self._fallback_filter_hotels(user_demand, hotels)
+            logger.info("ChatGPT successfully matched %d hotel IDs: %s", len(matched_ids), matched_ids)
+            return matched_ids
             
-        except (RateLimitError, APIError) as e:
-            error_str = str(e)
-            # Check if it's a quota/rate limit error
-            if "insufficient_quota" in error_str.lower() or "429" in error_str or "rate_limit" in error_str.lower() or isinstance(e, RateLimitError):
-                logger.warning(f"ChatGPT quota/rate limit exceeded, using fallback hotel filtering: {e}")
-                # Fallback to rule-based filtering
-                return self._fallback_filter_hotels(user_demand, hotels)
-            logger.error(f"ChatGPT API error for filtering: {e}")
-            logger.warning("Using fallback filtering due to API error")
-            # Fallback to rule-based filtering
-            return self._fallback_filter_hotels(user_demand, hotels)
-        except Exception as e:
-            logger.error(f"Unexpected error calling ChatGPT API for filtering: {e}", exc_info=True)
+        except json.JSONDecodeError:
+            logger.error("Response content: %s", content)
+            raise
+    
+    async def _ahandle_filter_error(
+        self, 
+        error: Exception, 
+        user_demand: str, 
+        hotels: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Log a hotel filtering error and fall back to rule-based filtering (never cached)"""
+        if isinstance(error, json.JSONDecodeError):
+            logger.error("Failed to parse ChatGPT filtering response: %s", error)
+            logger.warning("Using fallback filtering due to JSON parse error")
+        elif isinstance(error, (RateLimitError, APIError)):
+            if self._is_quota_error(error):
+                logger.warning("ChatGPT quota/rate limit exceeded, using fallback hotel filtering: %s", error)
+            else:
+                logger.error("ChatGPT API error for filtering: %s", error)
+                logger.warning("Using fallback filtering due to API error")
+        else:
+            logger.error("Unexpected error calling ChatGPT API for filtering: %s", error, exc_info=error)
             logger.warning("Using fallback filtering due to unexpected error")
-            # Fallback to rule-based filtering
-            return self._fallback_filter_hotels(user_demand, hotels)
+        # Fallback to rule-based filtering
+        return await self._afallback_filter_hotels(user_demand, hotels)
     
     def _fallback_extract_parameters(self, user_demand: str) -> ChatGPTParameterExtractionResponse:
         """
         Fallback method: Simple rule-based parameter extraction when ChatGPT quota is exceeded
         Uses basic keyword matching and regex patterns
         """
-        import re
-        from datetime import datetime, timedelta
-        
-        user_lower = user_demand.lower()
-        
-        # Extract location (look for common location keywords)
-        location = None
-        locations = ["italy", "france", "spain", "paris", "rome", "london", "berlin", "amsterdam", 
-                    "vienna", "prague", "barcelona", "madrid", "milan", "venice", "florence",
-                    "lake como", "tuscany", "santorini", "mykonos", "bali", "thailand"]
-        for loc in locations:
-            if loc in user_lower:
-                location = loc.title()
-                break
-        
-        # Extract budget
-        budget_max = None
-        budget_min = None
-        # Look for patterns like "under 200€", "below 200", "less than 200"
-        budget_patterns = [
-            r"under\s+(\d+)",
-            r"below\s+(\d+)",
-            r"less\s+than\s+(\d+)",
-            r"up\s+to\s+(\d+)",
-            r"max\s+(\d+)",
-            r"maximum\s+(\d+)",
-            r"(\d+)\s*€",
-            r"(\d+)\s*eur",
-            r"(\d+)\s*euro"
-        ]
-        for pattern in budget_patterns:
-            match = re.search(pattern, user_lower)
-            if match:
-                budget_max = float(match.group(1))
-                break
-        
-        # Extract preferences
-        preferences = []
-        pref_keywords = {
-            "romantic": ["romantic", "romance", "couple", "honeymoon"],
-            "family": ["family", "family-friendly", "kids", "children"],
-            "luxury": ["luxury", "luxurious", "5-star", "five star"],
-            "beach": ["beach", "seaside", "coastal", "ocean"],
-            "mountain": ["mountain", "alpine", "ski"],
-            "city": ["city", "urban", "downtown"]
-        }
-        for pref, keywords in pref_keywords.items():
-            if any(kw in user_lower for kw in keywords):
-                preferences.append(pref)
-        
-        # Extract number of adults/children (basic)
-        adults = 1
-        children = 0
-        adults_match = re.search(r"(\d+)\s+adult", user_lower)
-        if adults_match:
-            adults = int(adults_match.group(1))
+        location, budget_max, preferences, adults = _parse_extraction_intent(user_demand.lower())
         
         return ChatGPTParameterExtractionResponse(
             location=location,
             check_in=None,
             check_out=None,
-            budget_min=budget_min,
+            budget_min=None,
             budget_max=budget_max,
             adults=adults,
-            children=children,
+            children=0,
             rooms=1,
-            preferences=preferences if preferences else None
+            preferences=list(preferences) if preferences else None
         )
     
+    async def _afallback_filter_hotels(self, user_demand: str, hotels: List[Dict[str, Any]]) -> List[str]:
+        """Run the CPU-bound rule-based filter in a worker thread, keeping the event loop free"""
+        return await asyncio.to_thread(self._fallback_filter_hotels, user_demand, hotels)
+    
     def _fallback_filter_hotels(
         self, 
         user_demand: str, 
-        hotels: List[Dict[str, Any]]
+        hotels: List[Dict[str, Any]],
+        top_k: int = _FILTER_MAX_HOTELS
     ) -> List[str]:
         """
         Fallback method: Simple rule-based hotel filtering when ChatGPT quota is exceeded
-        Filters hotels based on basic keyword matching and price constraints
+        Filters hotels based on basic keyword matching and price constraints,
+        returning the IDs of the top_k best scoring hotels
         """
-        import re
-        
-        logger.info(f"Using fallback filter for user demand: '{user_demand}'")
-        user_lower = user_demand.lower()
-        matched_hotel_ids = []
-        
-        # Extract budget constraint
-        budget_max = None
-        budget_patterns = [
-            r"under\s+(\d+)",
-            r"below\s+(\d+)",
-            r"less\s+than\s+(\d+)",
-            r"up\s+to\s+(\d+)",
-            r"(\d+)\s*€",
-            r"(\d+)\s*eur",
-            r"budget",
-            r"cheap",
-            r"affordable"
-        ]
-        for pattern in budget_patterns:
-            match = re.search(pattern, user_lower)
-            if match:
-                if match.groups():
-                    budget_max = float(match.group(1))
-                else:
-                    # For "budget", "cheap", "affordable" - set a low budget
-                    budget_max = 100.0
-                break
-        
-        # Extract preference keywords
-        preference_keywords = {
-            "luxury": ["luxury", "premium", "5-star", "five star"],
-            "budget": ["budget", "cheap", "affordable", "economy"],
-            "romantic": ["romantic", "honeymoon", "couple"],
-            "family": ["family", "kids", "children", "family-friendly"],
-            "business": ["business", "corporate", "conference"],
-            "beach": ["beach", "seaside", "ocean", "coast"],
-            "pool": ["pool", "swimming"],
-            "spa": ["spa", "wellness", "massage"]
-        }
+        logger.info("Using fallback filter for user demand: '%s'", user_demand)
+        budget_max, detected_preferences = _parse_filter_intent(user_demand.lower())
         
-        detected_preferences = []
-        for pref, keywords in preference_keywords.items():
-            if any(kw in user_lower for kw in keywords):
-                detected_preferences.append(pref)
+        logger.info("Detected preferences: %s, budget_max: %s", detected_preferences, budget_max)
         
-        logger.info(f"Detected preferences: {detected_preferences}, budget_max: {budget_max}")
+        # Score all hotels at once with NumPy; missing prices and ratings count as 0
+        candidates = [(str(hotel.get("hotel_id", "")), hotel) for hotel in hotels]
+        candidates = [(hotel_id, hotel) for hotel_id, hotel in candidates if hotel_id]
+        count = len(candidates)
+        prices = np.fromiter((hotel.get("price") or 0 for _, hotel in candidates), dtype=float, count=count)
+        ratings = np.fromiter(
+            ((hotel.get("rating") or hotel.get("review_score", 0)) or 0 for _, hotel in candidates),
+            dtype=float,
+            count=count
+        )
+        has_price = prices != 0
+        scores = np.zeros(count)
         
-        # Score and filter hotels
-        scored_hotels = []
-        for hotel in hotels:
-            hotel_id = str(hotel.get("hotel_id", ""))
-            if not hotel_id:
-                continue
+        # Budget match (hotels over budget are still included, with a lower score)
+        if budget_max:
+            scores += np.where(has_price, np.where(prices <= budget_max, 10, -5), 0)
+        
+        # Preference matching based on name, amenities and description. Fields are only
+        # lowercased when a preference needs them, and hotel dicts are left untouched since they get saved
+        if detected_preferences:
+            names = [hotel.get("name", "").lower() for _, hotel in candidates]
+            descriptions = [hotel.get("description", "").lower() for _, hotel in candidates]
+            amenity_keywords = [
+                frozenset().union(*[_amenity_keywords(str(a)) for a in hotel.get("amenities", [])])
+                for _, hotel in candidates
+            ]
             
-            score = 0
-            price = hotel.get("price")
-            city = hotel.get("city", "").lower()
-            country = hotel.get("country", "").lower()
-            name = hotel.get("name", "").lower()
-            amenities = [a.lower() if isinstance(a, str) else str(a).lower() for a in hotel.get("amenities", [])]
-            amenities_str = " ".join(amenities)
-            description = hotel.get("description", "").lower()
+            def contains(texts: List[str], keywords: frozenset) -> np.ndarray:
+                return np.array([_contains_any(text, keywords) for text in texts], dtype=bool)
             
-            # Budget match
-            if budget_max and price:
-                if price <= budget_max:
-                    score += 10
-                else:
-                    # Still include but with lower score
-                    score -= 5
+            def has_amenity(keywords: frozenset) -> np.ndarray:
+                return np.array([not keywords.isdisjoint(found) for found in amenity_keywords], dtype=bool)
             
-            # Preference matching based on amenities and description
             if "luxury" in detected_preferences:
-                rating = hotel.get("rating") or hotel.get("review_score", 0)
-                if rating and rating >= 4.5:
-                    score += 5
-                if "luxury" in name or "resort" in name or "grand" in name:
-                    score += 3
+                scores += 5 * (ratings >= 4.5) + 3 * contains(names, _LUXURY_NAME_KEYWORDS)
             
             if "budget" in detected_preferences:
-                if price and price <= 100:
-                    score += 5
-                if "budget" in name or "inn" in name or "hostel" in name:
-                    score += 3
+                scores += 5 * (has_price & (prices <= 100)) + 3 * contains(names, _BUDGET_NAME_KEYWORDS)
             
             if "romantic" in detected_preferences:
-                if any(kw in amenities_str or kw in description for kw in ["spa", "romantic", "boutique"]):
-                    score += 5
+                scores += 5 * (has_amenity(_ROMANTIC_KEYWORDS) | contains(descriptions, _ROMANTIC_KEYWORDS))
             
             if "family" in detected_preferences:
-                if any(kw in amenities_str or kw in description for kw in ["pool", "kids", "family", "playground"]):
-                    score += 5
+                scores += 5 * (has_amenity(_FAMILY_KEYWORDS) | contains(descriptions, _FAMILY_KEYWORDS))
             
             if "beach" in detected_preferences:
-                if any(kw in amenities_str or kw in description or kw in name for kw in ["beach", "ocean", "seaside", "coast"]):
-                    score += 5
+                scores += 5 * (
+                    has_amenity(_BEACH_KEYWORDS)
+                    | contains(descriptions, _BEACH_KEYWORDS)
+                    | contains(names, _BEACH_KEYWORDS)
+                )
             
             if "pool" in detected_preferences:
-                if "pool" in amenities_str:
-                    score += 5
+                scores += 5 * has_amenity(frozenset({"pool"}))
             
             if "spa" in detected_preferences:
-                if "spa" in amenities_str:
-                    score += 5
-            
-            # Rating bonus (always apply)
-            rating = hotel.get("rating") or hotel.get("review_score", 0)
-            if rating:
-                score += rating * 1.5  # Higher rating = higher score
-            
-            # Base score for all hotels (so we don't exclude everything)
-            score += 1
-            
-            scored_hotels.append((score, hotel_id))
-            logger.debug(f"Hotel {hotel_id} ({name[:30]}): score={score:.1f}, price={price}, rating={rating}")
+                scores += 5 * has_amenity(frozenset({"spa"}))
+        
+        # Rating bonus (higher rating = higher score), plus a base score for all
+        # hotels so we don't exclude everything
+        scores += ratings * 1.5
+        scores += 1
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            for (hotel_id, hotel), score, price, rating in zip(candidates, scores, prices, ratings):
+                logger.debug(
+                    "Hotel %s (%s): score=%.1f, price=%s, rating=%s",
+                    hotel_id, hotel.get("name", "")[:30], score, price, rating
+                )
         
-        # Sort by score (descending) and return IDs
-        scored_hotels.sort(key=lambda x: x[0], reverse=True)
-        matched_hotel_ids = [hotel_id for _, hotel_id in scored_hotels]
+        # Top scores (descending, ties keep input order): partitioning at the k-th largest
+        # score leaves only the hotels that can make the cut to be sorted
+        top = np.arange(count)
+        if count > top_k:
+            kth_score = np.partition(scores, count - top_k)[count - top_k]
+            top = np.flatnonzero(scores >= kth_score)
+        top = top[np.argsort(-scores[top], kind="stable")][:top_k]
+        matched_hotel_ids = [candidates[i][0] for i in top]
         
-        logger.info(f"Fallback filtering matched {len(matched_hotel_ids)} hotels: {matched_hotel_ids[:5]}")
+        logger.info("Fallback filtering matched %d hotels: %s", len(matched_hotel_ids), matched_hotel_ids[:5])
         return matched_hotel_ids
 
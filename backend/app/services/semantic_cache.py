@@ -0,0 +1,136 @@
+"""
+Semantic cache: reuse results for texts whose embeddings are near-identical
+"""
+import logging
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+import numpy as np
+from cachetools import TTLCache
+from app.config import settings
+from app.services.chatgpt_service import get_openai_client, openai_semaphore
+
+logger = logging.getLogger(__name__)
+
+# Recent embeddings by (model, text), so caches looking up the same demand embed it once
+_recent_embeddings: TTLCache = TTLCache(maxsize=1024, ttl=300)
+
+
+class SemanticCache:
+    """
+    In-memory nearest-neighbour cache keyed by OpenAI text embeddings.
+    Lookups are a single matrix-vector product over L2-normalized vectors
+    (cosine similarity); entries expire after a TTL. An optional scope restricts
+    matches to entries stored under the same scope (e.g. the same hotel set, or the
+    demand's literal numbers, dates and location). Disabled unless semantic_cache_enabled.
+    """
+    
+    def __init__(
+        self,
+        enabled: bool = settings.semantic_cache_enabled,
+        threshold: float = settings.semantic_cache_threshold,
+        ttl: float = settings.semantic_cache_ttl,
+        maxsize: int = 1024,
+        model: str = "text-embedding-3-small"
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.model = model
+        self._vectors: Optional[np.ndarray] = None
+        self._scopes: np.ndarray = np.empty(0, dtype=np.int64)
+        self._values: List[Any] = []
+        self._expires_at: List[float] = []
+    
+    async def get_or_compute(
+        self, 
+        text: str, 
+        loader: Callable[[str], Awaitable[Tuple[Any, bool]]], 
+        scope: str = ""
+    ) -> Any:
+        """
+        Return the cached value for the nearest stored text, or load and store it
+        
+        Args:
+            text: Text to look up (e.g. the user's demand)
+            loader: Coroutine function computing (value, cacheable) on a cache miss;
+                values with cacheable False (e.g. rule-based fallbacks) are not stored
+            scope: Only entries stored with an equal scope can match
+            
+        Returns:
+            Cached or freshly loaded value
+        """
+        if not self.enabled or not settings.openai_api_key or self.threshold > 1:
+            value, _ = await loader(text)
+            return value
+        
+        try:
+            vector = await self._embed(text)
+        except Exception as e:
+            logger.warning("Embedding failed, bypassing semantic cache: %s", e)
+            value, _ = await loader(text)
+            return value
+        
+        scope_id = hash(scope)
+        value = self._lookup(vector, scope_id)
+        if value is not None:
+            logger.info("Semantic cache hit")
+            return value
+        
+        value, cacheable = await loader(text)
+        if cacheable:
+            self._add(vector, scope_id, value)
+        return value
+    
+    async def _embed(self, text: str) -> np.ndarray:
+        """Embed text as an L2-normalized float32 vector"""
+        key = (self.model, text)
+        vector = _recent_embeddings.get(key)
+        if vector is None:
+            async with openai_semaphore:
+                response = await get_openai_client().embeddings.create(model=self.model, input=text)
+            vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+            vector /= np.linalg.norm(vector)
+            _recent_embeddings[key] = vector
+        return vector
+    
+    def _lookup(self, vector: np.ndarray, scope_id: int) -> Optional[Any]:
+        """Find the most similar live entry in scope above the threshold"""
+        self._evict_expired()
+        if self._vectors is None or not self._values:
+            return None
+        
+        similarities = np.where(self._scopes == scope_id, self._vectors @ vector, -1.0)
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.threshold:
+            return self._values[best]
+        return None
+    
+    def _add(self, vector: np.ndarray, scope_id: int, value: Any) -> None:
+        """Store a new entry, dropping the oldest one when full"""
+        if self._vectors is None:
+            self._vectors = vector[np.newaxis, :]
+        else:
+            self._vectors = np.vstack([self._vectors, vector])
+        self._scopes = np.append(self._scopes, scope_id)
+        self._values.append(value)
+        self._expires_at.append(time.monotonic() + self.ttl)
+        
+        if len(self._values) > self.maxsize:
+            self._drop(1)
+    
+    def _evict_expired(self) -> None:
+        """Drop entries whose TTL has passed (entries are stored oldest first)"""
+        now = time.monotonic()
+        expired = 0
+        while expired < len(self._expires_at) and self._expires_at[expired] <= now:
+            expired += 1
+        if expired:
+            self._drop(expired)
+    
+    def _drop(self, count: int) -> None:
+        """Drop the oldest count entries"""
+        self._vectors = self._vectors[count:]
+        self._scopes = self._scopes[count:]
+        del self._values[:count]
+        del self._expires_at[:count]
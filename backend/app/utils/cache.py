@@ -0,0 +1,113 @@
+"""
+Caching helpers shared by services and API endpoints
+"""
+import asyncio
+import hashlib
+import logging
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+import redis.asyncio as redis
+from cachetools import TTLCache
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=1)
+def get_redis_client() -> Optional[redis.Redis]:
+    """
+    Shared Redis client for cross-worker response caches (None when REDIS_URL is not set).
+    Created on first use, and again after close_redis_client (e.g. when the app restarts)
+    """
+    return redis.from_url(settings.redis_url) if settings.redis_url else None
+
+
+async def close_redis_client() -> None:
+    """Close the shared Redis client's connections on shutdown"""
+    client = get_redis_client() if get_redis_client.cache_info().currsize else None
+    if client is not None:
+        await client.aclose()
+    get_redis_client.cache_clear()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into a single in-flight task.
+    Callers arriving while a task for their key is running await its result
+    instead of starting duplicate work.
+    """
+    
+    def __init__(self):
+        self._inflight: Dict[str, "asyncio.Task[Any]"] = {}
+    
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run func for key, or join the task already running for key
+        
+        Args:
+            key: Identity of the work (equal keys share one result)
+            func: Zero-argument coroutine function doing the work
+            
+        Returns:
+            The result (or exception) of the single task run for key
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one cancelled caller doesn't cancel the work for everyone else
+        return await asyncio.shield(task)
+
+
+class ResponseCache:
+    """
+    Exact-match cache of serialized responses: a per-process TTL LRU, backed by
+    Redis (shared across workers) when REDIS_URL is set. Redis errors count as misses.
+    """
+    
+    def __init__(self, prefix: str, ttl: int, maxsize: int = 4096):
+        self.prefix = prefix
+        self.ttl = ttl
+        self._local: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+    
+    def _key(self, key: str) -> str:
+        return self.prefix + hashlib.sha256(key.encode()).hexdigest()
+    
+    async def get(self, key: str) -> Optional[bytes]:
+        """
+        Look up key locally, then in Redis
+        
+        Args:
+            key: Canonical request key (hashed before storage)
+            
+        Returns:
+            The cached bytes, or None on a miss
+        """
+        key = self._key(key)
+        value = self._local.get(key)
+        redis_client = get_redis_client()
+        if value is not None or redis_client is None:
+            return value
+        try:
+            value = await redis_client.get(key)
+        except Exception as e:
+            logger.warning("Response cache read failed: %s", e)
+            return None
+        if value is not None:
+            self._local[key] = value
+        return value
+    
+    async def set(self, key: str, value: bytes) -> None:
+        """Store value for key locally and in Redis, for ttl seconds"""
+        key = self._key(key)
+        self._local[key] = value
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return
+        try:
+            await redis_client.setex(key, self.ttl, value)
+        except Exception as e:
+            logger.warning("Response cache write failed: %s", e)
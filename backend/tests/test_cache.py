@@ -0,0 +1,86 @@
+"""
+Tests for the caching helpers in app.utils.cache
+"""
+import asyncio
+import pytest
+from app.utils.cache import SingleFlight
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    """Two concurrent calls for the same key share one loader call"""
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(flight.do("key", load), flight.do("key", load))
+
+    assert asyncio.run(run()) == ["result", "result"]
+    assert len(calls) == 1
+
+
+def test_single_flight_different_keys_run_separately():
+    """Calls for different keys each run their own loader"""
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(flight.do("a", load), flight.do("b", load))
+
+    assert sorted(asyncio.run(run())) == [2, 2]
+    assert len(calls) == 2
+
+
+def test_single_flight_cancelled_waiter_does_not_cancel_shared_task():
+    """Cancelling one waiter leaves the shared task running for the others"""
+    calls = []
+    release = None
+
+    async def load():
+        calls.append(1)
+        await release.wait()
+        return "result"
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        flight = SingleFlight()
+        first = asyncio.create_task(flight.do("key", load))
+        second = asyncio.create_task(flight.do("key", load))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        release.set()
+        return await second
+
+    assert asyncio.run(run()) == "result"
+    assert len(calls) == 1
+
+
+def test_single_flight_forgets_finished_tasks():
+    """A call after the shared task finished runs the loader again"""
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return len(calls)
+
+    async def run():
+        flight = SingleFlight()
+        first = await flight.do("key", load)
+        await asyncio.sleep(0)  # Let the done callback drop the finished task
+        return first, await flight.do("key", load)
+
+    assert asyncio.run(run()) == (1, 2)
@@ -0,0 +1,62 @@
+"""
+Tests for the streaming JSON helper in app.services.chatgpt_service
+"""
+import pytest
+from app.services.chatgpt_service import parse_partial_json_object
+
+
+def test_complete_object():
+    """Complete input yields every field"""
+    text = '{"location": "Rome", "budget_max": 200, "adults": 2, "preferences": ["spa"]}'
+    assert parse_partial_json_object(text) == {
+        "location": "Rome", "budget_max": 200, "adults": 2, "preferences": ["spa"]
+    }
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", {}),
+    ("{", {}),
+    ('{"loca', {}),
+    ('{"location": "Ro', {}),
+    ('{"location": "Rome"', {}),
+    ('{"location": "Rome", "check_in": nu', {"location": "Rome"}),
+    ('{"location": "Rome", "check_in": "2025-', {"location": "Rome"}),
+])
+def test_truncated_strings(text, expected):
+    """Only fields whose value is complete and followed by a delimiter are returned"""
+    assert parse_partial_json_object(text) == expected
+
+
+def test_truncated_number_is_not_reported():
+    """A number is incomplete until a delimiter follows it (12 may still become 120)"""
+    assert parse_partial_json_object('{"budget_max": 12') == {}
+    assert parse_partial_json_object('{"budget_max": 12,') == {"budget_max": 12}
+
+
+def test_escaped_quotes():
+    """Escaped quotes inside strings neither end the string nor break later fields"""
+    text = '{"location": "The \\"Grand\\" Hotel", "preferences": ["say \\"hi\\""], "adults": 1}'
+    assert parse_partial_json_object(text) == {
+        "location": 'The "Grand" Hotel', "preferences": ['say "hi"'], "adults": 1
+    }
+    assert parse_partial_json_object('{"location": "The \\"Gra') == {}
+
+
+def test_nested_objects():
+    """Nested values are reported whole, once their closing bracket has streamed"""
+    assert parse_partial_json_object('{"a": 1, "dates": {"check_in": "2025-06-01"') == {"a": 1}
+    assert parse_partial_json_object('{"a": 1, "dates": {"check_in": "2025-06-01"}, ') == {
+        "a": 1, "dates": {"check_in": "2025-06-01"}
+    }
+
+
+def test_leading_text_and_whitespace():
+    """Text before the object (e.g. a code fence) and whitespace are skipped"""
+    text = '```json\n{\n  "location" :  "Paris" ,\n  "adults": 2\n}'
+    assert parse_partial_json_object(text) == {"location": "Paris", "adults": 2}
+
+
+def test_malformed_input():
+    """Non-string keys or missing colons stop parsing at the last good field"""
+    assert parse_partial_json_object('{"a": 1, 2: 3}') == {"a": 1}
+    assert parse_partial_json_object('{"a" 1}') == {}